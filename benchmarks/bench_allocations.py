@@ -0,0 +1,78 @@
+# Pranav Minasandra
+# pminasandra.github.io
+
+"""
+Measures how much memory object detection allocates per frame, with one-off
+calls to trackutils.get_contours (which sets up everything anew for each
+frame) and with a single long-lived trackutils.Detector (as the server uses).
+
+Reported numbers are the mean peak memory (in KiB) allocated above the
+steady state while processing one frame, as seen by tracemalloc, i.e.
+numpy arrays and Python objects. One full frame is also shown for scale.
+
+Usage:
+    python benchmarks/bench_allocations.py [--frames 200] [--scaling 1.0]
+"""
+
+import argparse
+import json
+import tracemalloc
+
+from tracktorlive import trackutils
+
+from benchutils import DEFAULT_VIDEO, DEFAULT_PARAMS, read_frames
+
+WARMUP = 10
+
+def measure(frames, detect):
+    """
+    Calls detect(frame) on each frame, and returns the mean peak allocation
+    per frame (bytes) after a few warm-up frames.
+    """
+    total = 0
+    tracemalloc.start()
+    for i, frame in enumerate(frames):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        detect(frame)
+        _, peak = tracemalloc.get_traced_memory()
+        if i >= WARMUP:
+            total += peak - before
+    tracemalloc.stop()
+    return total/(len(frames) - WARMUP)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=DEFAULT_VIDEO)
+    parser.add_argument("--params", default=DEFAULT_PARAMS)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--scaling", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with open(args.params) as f:
+        params = json.load(f)
+    frames = read_frames(args.video, args.frames)
+    print(f"one frame: {frames[0].nbytes/1024:.0f} KiB")
+
+    print("method\tdraw\tKiB/frame")
+    for draw in [False, True]:
+        meas_last, meas_now = [], []
+        def oneoff(frame):
+            trackutils.get_contours(frame, meas_last=meas_last,
+                                        meas_now=meas_now,
+                                        scaling=args.scaling,
+                                        draw_contours=draw,
+                                        **params)
+        kib = measure(frames, oneoff)/1024
+        print(f"get_contours\t{draw}\t{kib:.1f}")
+
+        detector = trackutils.Detector(frames[0].shape,
+                                        scaling=args.scaling, **params)
+        def reused(frame):
+            detector.detect(frame, meas_last, meas_now, draw_contours=draw)
+        kib = measure(frames, reused)/1024
+        print(f"Detector\t{draw}\t{kib:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Pranav Minasandra
+# pminasandra.github.io
+
+"""
+Measures the time taken to match individuals to detected locations
+(tracktor.hungarian_algorithm) for simulated colonies of various sizes, with
+the dense solver and with the gated solver used for large colonies. The
+gated solver pays off only for colonies larger than
+tracktor.DENSE_ASSIGNMENT_LIMIT, below which hungarian_algorithm uses the
+dense one.
+
+Individuals are spread uniformly about 100 px apart, and move by a random
+step of given size between frames.
+
+Usage:
+    python benchmarks/bench_assignment.py [--sizes 100 200 300 500 1000] [--steps 2 10 30]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from tracktorlive import tracktor as tr
+
+def simulate(n_inds, step, rng):
+    """Returns positions in two successive frames, the second shuffled."""
+    last = rng.random((n_inds, 2))*np.sqrt(n_inds)*100
+    now = last + rng.normal(0, step, last.shape)
+    return last, now[rng.permutation(n_inds)]
+
+def time_assignment(last, now, dense_limit, repeats):
+    """Returns the mean time (ms) for one assignment."""
+    saved = tr.DENSE_ASSIGNMENT_LIMIT
+    tr.DENSE_ASSIGNMENT_LIMIT = dense_limit
+    try:
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            tr.hungarian_algorithm(last, now)
+        return 1000*(time.perf_counter() - t0)/repeats
+    finally:
+        tr.DENSE_ASSIGNMENT_LIMIT = saved
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[100, 200, 300, 500, 1000])
+    parser.add_argument("--steps", type=float, nargs="+", default=[2, 10, 30])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"dense solver used up to {tr.DENSE_ASSIGNMENT_LIMIT} individuals")
+    print("n_ind\tstep\tdense ms\tgated ms\tfaster")
+    for n_inds in args.sizes:
+        for step in args.steps:
+            last, now = simulate(n_inds, step, rng)
+            dense = time_assignment(last, now, np.inf, args.repeats)
+            gated = time_assignment(last, now, 0, args.repeats)
+            faster = "dense" if dense < gated else "gated"
+            print(f"{n_inds}\t{step:g}\t{dense:.2f}\t{gated:.2f}\t{faster}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Pranav Minasandra
+# pminasandra.github.io
+
+"""
+Measures server throughput (frames per second) on a video file while a varying
+number of clients are attached and polling the feed.
+
+Two modes are compared:
+    seqlock: clients as they are, reading the feed lock-free and woken up
+        by the server on each new frame.
+    semaphore: the design that preceded them, as a baseline. A semaphore
+        served by a manager process is taken by the tracking loop on every
+        frame, and by each client whenever it polls (every 5 ms) and copies
+        the whole buffer, so that every access is a socket round trip.
+
+Usage:
+    python benchmarks/bench_clients.py [--clients 1 8 32] [--frames 600]
+                                        [--modes seqlock semaphore]
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import time
+
+import tracktorlive as trl
+
+from benchutils import DEFAULT_VIDEO, DEFAULT_PARAMS
+
+MODES = ["seqlock", "semaphore"]
+POLL_INTERVAL = 0.005 # seconds, how often clients polled in the old design
+
+def run_once(video, params, n_clients, n_frames, mode="seqlock"):
+    """
+    Tracks n_frames frames of video with n_clients attached, and returns the
+    server fps.
+    """
+    frames = mp.Value('i', 0)
+    elapsed = mp.Value('d', 0.0)
+
+    manager = None
+    sem = None
+    if mode == "semaphore":
+        manager = mp.Manager()
+        sem = manager.Semaphore(1)
+
+    server, semm = trl.spawn_trserver(video, params=params, realtime=False)
+
+    @server
+    def count(server):
+        if sem is not None:
+            with sem:
+                pass
+        frames.value += 1
+        if frames.value >= n_frames:
+            server.running.value = False
+
+    @server.stopfunc
+    def finish(server):
+        elapsed.value = time.time() - server.t_run_begin
+
+    clients = []
+    for i in range(n_clients):
+        if sem is None:
+            cl = trl.spawn_trclient(server.feed_id)
+            @cl
+            def latest(data, clock):
+                return data[:, :, -1], clock[-1]
+        else:
+            cl = trl.spawn_trclient(server.feed_id,
+                                    run_interval=POLL_INTERVAL,
+                                    wait_for_frames=False)
+            @cl
+            def latest(data, clock, cl=cl):
+                with sem:
+                    data, clock = cl.get_data_and_clock()
+                return data[:, :, -1], clock[-1]
+        clients.append(cl)
+
+    trl.run_trsession(server, semm, clients)
+    if manager is not None:
+        manager.shutdown()
+    return frames.value/elapsed.value
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=DEFAULT_VIDEO)
+    parser.add_argument("--params", default=DEFAULT_PARAMS)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    args = parser.parse_args()
+
+    with open(args.params) as f:
+        params = json.load(f)
+
+    trl.SUPPRESS_INFORMATIVE_PRINT = True
+    print("clients\t" + "\t".join(f"{mode} fps" for mode in args.modes))
+    for n_clients in args.clients:
+        fps = [run_once(args.video, params, n_clients, args.frames, mode)
+                for mode in args.modes]
+        print(f"{n_clients}\t" + "\t".join(f"{x:.1f}" for x in fps))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Pranav Minasandra
+# pminasandra.github.io
+
+"""
+Measures the time taken to find objects in frames of a video, for each
+detection backend, on the frames as they are and on a noisy copy of them
+(small dark specks, like the ones in grainy or cluttered outdoor footage,
+which get thresholded into thousands of blobs too small to be animals).
+
+Usage:
+    python benchmarks/bench_detection.py [--frames 300] [--specks 5000]
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from tracktorlive import trackutils
+
+from benchutils import DEFAULT_VIDEO, DEFAULT_PARAMS, read_frames
+
+BACKENDS = ["contours", "components"]
+
+def add_specks(frames, n_specks, seed=0):
+    """Returns copies of frames with n_specks small dark specks added to each."""
+    rng = np.random.default_rng(seed)
+    noisy = []
+    for frame in frames:
+        frame = frame.copy()
+        H, W = frame.shape[:2]
+        ys = rng.integers(0, H - 3, n_specks)
+        xs = rng.integers(0, W - 3, n_specks)
+        for dy in range(3):
+            for dx in range(3):
+                frame[ys + dy, xs + dx] = 0
+        noisy.append(frame)
+    return noisy
+
+def run_once(frames, params, backend):
+    """
+    Detects objects in all frames, and returns the mean time per frame (ms)
+    and the mean number of objects found.
+    """
+    n_found = 0
+    t0 = time.perf_counter()
+    for frame in frames:
+        _, _, _, meas_now = trackutils.get_contours(frame,
+                                        meas_last=[], meas_now=[],
+                                        scaling=1.0,
+                                        backend=backend,
+                                        **params
+                                    )
+        n_found += len(meas_now)
+    elapsed = time.perf_counter() - t0
+    return 1000*elapsed/len(frames), n_found/len(frames)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default=DEFAULT_VIDEO)
+    parser.add_argument("--params", default=DEFAULT_PARAMS)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--specks", type=int, default=5000)
+    args = parser.parse_args()
+
+    with open(args.params) as f:
+        params = json.load(f)
+    frames = read_frames(args.video, args.frames)
+    noisy = add_specks(frames, args.specks)
+
+    print("frames\tbackend\tms/frame\tobjects/frame")
+    for name, frs in [("clean", frames), ("noisy", noisy)]:
+        for backend in BACKENDS:
+            ms, found = run_once(frs, params, backend)
+            print(f"{name}\t{backend}\t{ms:.2f}\t{found:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Pranav Minasandra
+# pminasandra.github.io
+
+"""
+Measures the per-frame cost of each stage of the tracking pipeline (decoding,
+detection, and cleanup of centroids, i.e., clustering and identity
+assignment) on the tutorial videos of a single individual.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--frames 1000]
+"""
+
+import argparse
+import json
+from os.path import join as joinpath
+import time
+
+import cv2
+
+from tracktorlive import splitting
+from tracktorlive import trackutils
+
+from benchutils import TUTORIALS
+
+VIDEOS = {
+    "ant.mp4": (joinpath(TUTORIALS, "03-tuning-params", "ant.mp4"),
+                joinpath(TUTORIALS, "03-tuning-params", "supplied-params.json")),
+    "mouse_video.mp4": (joinpath(TUTORIALS, "06-arduino-comm", "mouse_video.mp4"),
+                joinpath(TUTORIALS, "06-arduino-comm", "mouse-params.json")),
+}
+
+def run_once(video, params, n_frames, n_ind=1):
+    """
+    Tracks up to n_frames frames of video, and returns the number of frames
+    and the mean time (ms) per frame spent in each stage.
+    """
+    cap = cv2.VideoCapture(video)
+    _, frame = cap.read()
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    detector = trackutils.Detector(frame.shape, **params)
+    splitter = splitting.BlobSplitter(n_ind)
+    meas_last = []
+    meas_now = []
+
+    times = {"decode": 0.0, "detect": 0.0, "cleanup": 0.0}
+    count = 0
+    while count < n_frames:
+        t0 = time.perf_counter()
+        ret, frame = cap.read()
+        if not ret:
+            break
+        t1 = time.perf_counter()
+        final, contours, meas_last, meas_now = detector.detect(frame,
+                                                    meas_last, meas_now)
+        t2 = time.perf_counter()
+        final, meas_now = trackutils.cleanup_centroids(final, contours,
+                                    n_inds=n_ind,
+                                    meas_last=meas_last,
+                                    meas_now=meas_now,
+                                    mot=n_ind>1,
+                                    frame_index=count,
+                                    splitter=splitter
+                                )
+        t3 = time.perf_counter()
+        times["decode"] += t1 - t0
+        times["detect"] += t2 - t1
+        times["cleanup"] += t3 - t2
+        count += 1
+    cap.release()
+    return count, {k: 1000*v/count for k, v in times.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=1000)
+    args = parser.parse_args()
+
+    print("video\tframes\tdecode ms\tdetect ms\tcleanup ms\ttotal ms")
+    for name, (video, paramfile) in VIDEOS.items():
+        with open(paramfile) as f:
+            params = json.load(f)
+        count, times = run_once(video, params, args.frames)
+        total = sum(times.values())
+        print(f"{name}\t{count}\t{times['decode']:.3f}\t{times['detect']:.3f}"
+                f"\t{times['cleanup']:.3f}\t{total:.3f}")
+
+if __name__ == "__main__":
+    main()
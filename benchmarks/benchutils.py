@@ -0,0 +1,30 @@
+# Pranav Minasandra
+# 18 Oct 2026
+# pminasandra.github.io
+
+"""
+Paths and helpers shared by the benchmarks.
+"""
+
+from os.path import dirname, abspath
+from os.path import join as joinpath
+
+import cv2
+
+REPO_DIR = dirname(dirname(abspath(__file__)))
+TUTORIALS = joinpath(REPO_DIR, "tutorials")
+DEFAULT_VIDEO = joinpath(TUTORIALS, "03-tuning-params", "ant.mp4")
+DEFAULT_PARAMS = joinpath(TUTORIALS, "03-tuning-params",
+                            "supplied-params.json")
+
+def read_frames(video, n_frames):
+    """Returns the first n_frames frames of video."""
+    cap = cv2.VideoCapture(video)
+    frames = []
+    while len(frames) < n_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
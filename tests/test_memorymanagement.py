@@ -0,0 +1,125 @@
+# Pranav Minasandra
+# 18 Oct 2026
+# pminasandra.github.io
+
+"""
+Tests of TrackRing: publishing samples and reading them back.
+"""
+
+import numpy as np
+import pytest
+
+from tracktorlive import memorymanagement as mmg
+
+N_IND = 2
+LENGTH = 5
+
+@pytest.fixture
+def ring():
+    datasize, clocksize = mmg.trackring_sizes(N_IND, LENGTH)
+    datashm = mmg.create_shared_data(datasize)
+    clockshm = mmg.create_shared_data(clocksize)
+    ring = mmg.TrackRing(datashm, clockshm, N_IND, LENGTH)
+    ring.reset()
+    yield ring
+    del ring
+    for shm in (datashm, clockshm):
+        shm.close()
+        shm.unlink()
+
+def push_samples(ring, start, stop):
+    """Publishes samples start..stop-1, sample i at clock i and (i, -i)."""
+    for i in range(start, stop):
+        ring.push([[i, -i]]*N_IND, float(i))
+
+def test_ordered_before_any_sample(ring):
+    data, clock = ring.ordered()
+    assert data.shape == (N_IND, 2, LENGTH)
+    assert np.all(np.isnan(clock))
+    assert ring.seq == 0
+    assert ring.head == -1
+
+def test_ordered_puts_newest_last(ring):
+    push_samples(ring, 0, 3)
+    data, clock = ring.ordered()
+    assert np.all(np.isnan(clock[:2]))
+    assert clock[2:].tolist() == [0.0, 1.0, 2.0]
+    assert data[1, 1, 2:].tolist() == [0.0, -1.0, -2.0]
+
+def test_ordered_wraps_around(ring):
+    push_samples(ring, 0, LENGTH + 3)
+    data, clock = ring.ordered()
+    assert clock.tolist() == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert data[0, 0].tolist() == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert ring.seq == LENGTH + 3
+    assert ring.head == (LENGTH + 2) % LENGTH
+
+def test_missing_individuals_are_negative(ring):
+    ring.push([[7, 8]], 0.0)
+    data, _ = ring.ordered()
+    assert data[:, :, -1].tolist() == [[7.0, 8.0], [-1.0, -1.0]]
+
+def test_window_before_any_sample(ring):
+    data, clock = ring.window(3)
+    assert data.shape == (N_IND, 2, 3)
+    assert np.all(np.isnan(clock))
+
+def test_window_returns_newest_in_order(ring):
+    push_samples(ring, 0, 3)
+    data, clock = ring.window(2)
+    assert clock.tolist() == [1.0, 2.0]
+    assert data[0, 0].tolist() == [1.0, 2.0]
+    assert data[1, 1].tolist() == [-1.0, -2.0]
+
+def test_window_wraps_around(ring):
+    push_samples(ring, 0, LENGTH + 3)
+    data, clock = ring.window(4)
+    assert clock.tolist() == [4.0, 5.0, 6.0, 7.0]
+    assert data[0, 0].tolist() == [4.0, 5.0, 6.0, 7.0]
+
+def test_window_is_capped_at_ring_length(ring):
+    push_samples(ring, 0, LENGTH + 1)
+    _, clock = ring.window(2*LENGTH)
+    assert clock.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+def test_window_upto_blanks_overwritten_samples(ring):
+    push_samples(ring, 0, LENGTH + 2)
+    # as it was after 4 samples, of which 0 and 1 are since overwritten
+    _, clock = ring.window(4, upto=4)
+    assert np.all(np.isnan(clock[:2]))
+    assert clock[2:].tolist() == [2.0, 3.0]
+
+def test_window_copies(ring):
+    push_samples(ring, 0, 2)
+    data, clock = ring.window(2)
+    push_samples(ring, 2, LENGTH + 2)
+    assert clock.tolist() == [0.0, 1.0]
+    assert data[0, 0].tolist() == [0.0, 1.0]
+
+def test_since_returns_only_new_samples(ring):
+    push_samples(ring, 0, 3)
+    data, clock, seq, gaps = ring.since(0)
+    assert clock.tolist() == [0.0, 1.0, 2.0]
+    assert (seq, gaps) == (3, 0)
+
+    push_samples(ring, 3, 5)
+    data, clock, seq, gaps = ring.since(seq)
+    assert clock.tolist() == [3.0, 4.0]
+    assert data[0, 0].tolist() == [3.0, 4.0]
+    assert (seq, gaps) == (5, 0)
+
+def test_since_with_nothing_new(ring):
+    push_samples(ring, 0, 2)
+    data, clock, seq, gaps = ring.since(2)
+    assert data.shape == (N_IND, 2, 0)
+    assert len(clock) == 0
+    assert (seq, gaps) == (2, 0)
+
+def test_since_counts_overwritten_samples(ring):
+    push_samples(ring, 0, 2)
+    _, _, seq, _ = ring.since(0)
+    push_samples(ring, 2, 2 + LENGTH + 3)
+    _, clock, seq, gaps = ring.since(seq)
+    assert gaps == 3
+    assert clock.tolist() == [5.0, 6.0, 7.0, 8.0, 9.0]
+    assert seq == 10
@@ -0,0 +1,82 @@
+# Pranav Minasandra
+# 18 Oct 2026
+# pminasandra.github.io
+
+"""
+Tests of sessions: Recording.save and read_session.
+"""
+
+import numpy as np
+import pytest
+
+from tracktorlive import recordings
+
+N_IND = 3
+
+def make_recording(n_samples, capacity=4):
+    rng = np.random.default_rng(0)
+    rec = recordings.Recording(N_IND, capacity=capacity)
+    points = rng.random((n_samples, N_IND, 2))*100
+    for i in range(n_samples):
+        rec.append(points[i], t=i/30, frame_index=2*i)
+    return rec, points
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_session_round_trip(tmp_path, mmap):
+    rec, points = make_recording(10) # grows past its capacity
+    filename = rec.save(str(tmp_path/"session"), metadata={"fps": 30})
+    assert filename.endswith(".npz")
+
+    columns, header = recordings.read_session(filename, mmap=mmap)
+    assert header == {"fps": 30, "n_ind": N_IND, "samples": 10}
+    assert np.array_equal(columns["points"], points)
+    assert np.array_equal(columns["clock"], np.arange(10)/30)
+    assert np.array_equal(columns["frame"], 2*np.arange(10))
+    assert isinstance(columns["points"], np.memmap) == mmap
+
+def test_session_is_readable_by_numpy(tmp_path):
+    rec, points = make_recording(5)
+    filename = rec.save(str(tmp_path/"session.npz"))
+    with np.load(filename) as f:
+        assert np.array_equal(f["points"], points)
+
+def test_empty_session(tmp_path):
+    rec = recordings.Recording(N_IND)
+    filename = rec.save(str(tmp_path/"empty"))
+    columns, header = recordings.read_session(filename)
+    assert header["samples"] == 0
+    assert columns["points"].shape == (0, N_IND, 2)
+    assert len(columns["clock"]) == 0
+
+def test_extend_matches_append(tmp_path):
+    appended, points = make_recording(6)
+    extended = recordings.Recording(N_IND, capacity=2)
+    extended.extend(points, np.arange(6)/30, 2*np.arange(6))
+    for name in ("clock", "frame", "points"):
+        assert np.array_equal(getattr(extended, name),
+                                getattr(appended, name))
+
+@pytest.mark.parametrize("precision", ["f8", "f4"])
+def test_csv_export_is_exact(tmp_path, precision):
+    rng = np.random.default_rng(2)
+    points = rng.random((7, N_IND, 2))*1000
+    times = np.cumsum(rng.random(7))/3
+    filename = str(tmp_path/"tracks.tltracks")
+    log = recordings.TrackLog(filename, N_IND, precision=precision,
+                                chunk_size=3)
+    for i in range(7):
+        log.append(points[i], times[i], i)
+    log.close()
+
+    records, header = recordings.read_tracklog(filename)
+    assert header["n_ind"] == N_IND
+    assert np.array_equal(records["frame"], np.arange(7))
+
+    csvfile = recordings.export_csv(filename)
+    assert csvfile == str(tmp_path/"tracks.csv")
+    table = np.loadtxt(csvfile, delimiter=",", skiprows=1)
+    assert np.array_equal(table[:, 0], times)
+    assert np.array_equal(table[:, 1:].astype(precision),
+                            records["points"].reshape(7, -1))
+    assert np.array_equal(table[:, 1:].astype(precision),
+                            points.reshape(7, -1).astype(precision))
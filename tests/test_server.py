@@ -0,0 +1,31 @@
+# Pranav Minasandra
+# 18 Oct 2026
+# pminasandra.github.io
+
+"""
+Tests of the checks TracktorServer makes of its arguments, before it opens
+any video source.
+"""
+
+import pytest
+
+from tracktorlive import server
+
+PARAMS = {"fps": 30}
+
+@pytest.mark.parametrize("kwargs", [
+    dict(frame_stride=0, realtime=False),
+    dict(frame_stride=2, realtime=True),
+    dict(frame_stride=31, realtime=False, buffer_size=1),
+    dict(frame_stride=10, realtime=False, buffer_size=0.3),
+])
+def test_bad_frame_stride_is_rejected(kwargs):
+    with pytest.raises(ValueError):
+        server.TracktorServer("no-such-video.mp4", PARAMS, 1, **kwargs)
+
+def test_port_num_is_deprecated():
+    with pytest.warns(DeprecationWarning):
+        # stopped by the bad stride before any video is opened
+        with pytest.raises(ValueError):
+            server.TracktorServer("no-such-video.mp4", PARAMS, 1,
+                                    port_num=281197, frame_stride=0)
@@ -0,0 +1,281 @@
+# Pranav Minasandra
+# 18 Oct 2026
+# pminasandra.github.io
+
+"""
+Tests of helpers for tracking frames.
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from tracktorlive import trackutils
+from tracktorlive import videoout
+
+H, W = 24, 32
+
+def bgr_frame():
+    """A BGR frame with a different value in every channel and pixel."""
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (H, W, 3), dtype=np.uint8)
+
+def yuyv(gray):
+    """Packs a grayscale frame as YUYV, with arbitrary chroma bytes."""
+    packed = np.full((H, W, 2), 77, dtype=np.uint8)
+    packed[:, :, 0] = gray
+    return packed.reshape(H, 2*W)
+
+class RawCamera:
+    """
+    Stands in for a cv2.VideoCapture delivering raw frames, such as a camera
+    read with CAP_PROP_CONVERT_RGB off.
+    """
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.grabbed = None
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FRAME_WIDTH: W,
+                cv2.CAP_PROP_FRAME_HEIGHT: H}.get(prop, 0)
+
+    def grab(self):
+        if not self.frames:
+            return False
+        self.grabbed = self.frames.pop(0)
+        return True
+
+    def retrieve(self, out=None):
+        if out is None:
+            return True, self.grabbed.copy()
+        np.copyto(out, self.grabbed)
+        return True, out
+
+    def read(self, out=None):
+        return self.grab() and self.retrieve(out)
+
+@pytest.fixture
+def gray_video(tmp_path):
+    """A short grayscale video file, and its frames as read back in BGR."""
+    rng = np.random.default_rng(1)
+    frames = [np.kron(rng.integers(0, 256, (H//8, W//8), dtype=np.uint8),
+                        np.ones((8, 8), dtype=np.uint8))
+                for _ in range(3)]
+    filename = str(tmp_path/"gray.avi")
+    videoout.vidout(frames, filename, 10, (W, H), "MJPG")
+    cap = cv2.VideoCapture(filename)
+    decoded = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        decoded.append(frame)
+    cap.release()
+    assert len(decoded) == 3
+    return filename, decoded
+
+class NegotiatingCamera:
+    """
+    Stands in for a cv2.VideoCapture of a camera that settles on the given
+    format, whatever it is asked for.
+    """
+
+    def __init__(self, source, fourcc):
+        self.props = {cv2.CAP_PROP_FOURCC: cv2.VideoWriter_fourcc(*fourcc),
+                        cv2.CAP_PROP_CONVERT_RGB: 1}
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return float(self.props.get(prop, 0))
+
+    def set(self, prop, value):
+        if prop != cv2.CAP_PROP_FOURCC:
+            self.props[prop] = value
+        return True
+
+@pytest.mark.parametrize("fourcc, raw", [("YUYV", True), ("GREY", True),
+                                            ("MJPG", False), ("H264", False)])
+def test_get_vid_asks_for_raw_frames_only_in_known_layouts(monkeypatch,
+                                                            fourcc, raw):
+    monkeypatch.setattr(trackutils.cv2, "VideoCapture",
+                        lambda source: NegotiatingCamera(source, fourcc))
+    cap = trackutils.get_vid(0, grayscale=True)
+    assert cap.get(cv2.CAP_PROP_CONVERT_RGB) == (0 if raw else 1)
+
+def test_fourcc_name():
+    assert trackutils.fourcc_name(cv2.VideoWriter_fourcc(*"YUYV")) == "YUYV"
+
+def test_to_gray_converts_bgr():
+    frame = bgr_frame()
+    out = np.empty((H, W), dtype=np.uint8)
+    assert trackutils.to_gray(frame, out) is out
+    assert np.array_equal(out, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+
+@pytest.mark.parametrize("shape", [(H, W), (H, W, 1), (1, H*W)])
+def test_to_gray_copies_single_channel(shape):
+    gray = bgr_frame()[:, :, 0]
+    out = np.empty((H, W), dtype=np.uint8)
+    trackutils.to_gray(gray.reshape(shape), out)
+    assert np.array_equal(out, gray)
+
+def test_to_gray_takes_y_plane_of_yuyv():
+    gray = bgr_frame()[:, :, 1]
+    out = np.empty((H, W), dtype=np.uint8)
+    trackutils.to_gray(yuyv(gray), out)
+    assert np.array_equal(out, gray)
+
+@pytest.mark.parametrize("shape", [(H, W, 4), (H, W + 1), (3*H, W)])
+def test_to_gray_rejects_other_layouts(shape):
+    out = np.empty((H, W), dtype=np.uint8)
+    with pytest.raises(ValueError):
+        trackutils.to_gray(np.zeros(shape, dtype=np.uint8), out)
+
+def test_get_frame_in_grayscale(gray_video):
+    filename, decoded = gray_video
+    cap = trackutils.get_vid(filename, grayscale=True)
+    frame, frame_index = trackutils.get_frame(cap, grayscale=True)
+    cap.release()
+    assert frame.shape == (H, W)
+    assert np.array_equal(frame,
+                            cv2.cvtColor(decoded[0], cv2.COLOR_BGR2GRAY))
+    assert frame_index == 1
+
+def test_capture_reads_grayscale_into_out(gray_video):
+    filename, decoded = gray_video
+    cap = trackutils.Capture(trackutils.get_vid(filename, grayscale=True),
+                                grayscale=True, raw_shape=(H, W, 3))
+    out = np.empty((H, W), dtype=np.uint8)
+    for i, expected in enumerate(decoded):
+        frame, frame_index = cap.read(out)
+        assert frame is out
+        assert frame_index == i + 1
+        assert np.array_equal(frame,
+                                cv2.cvtColor(expected, cv2.COLOR_BGR2GRAY))
+    with pytest.raises(trackutils.VideoEndedError):
+        cap.read(out)
+    cap.release()
+
+def test_capture_reads_raw_yuyv_camera():
+    grays = [bgr_frame()[:, :, i] for i in range(3)]
+    cap = trackutils.Capture(RawCamera(yuyv(g) for g in grays),
+                                grayscale=True)
+    for gray in grays:
+        frame, _ = cap.read()
+        assert frame.shape == (H, W)
+        assert np.array_equal(frame, gray)
+
+def square(x, y, side):
+    """Returns a square contour with top-left corner (x, y)."""
+    return np.array([[[x, y]], [[x + side, y]],
+                        [[x + side, y + side]], [[x, y + side]]],
+                    dtype=np.int32)
+
+def centroid(x, y, side):
+    return [x + side/2, y + side/2]
+
+def blobs():
+    """A small blob and a large one."""
+    contours = [square(10, 10, 4), square(200, 150, 30)]
+    meas_now = [centroid(10, 10, 4), centroid(200, 150, 30)]
+    return contours, meas_now
+
+def test_select_individual_picks_largest_blob_first():
+    final = np.zeros((300, 400, 3), dtype=np.uint8)
+    contours, meas_now = blobs()
+    _, meas_now = trackutils.select_individual(final, contours, [], meas_now,
+                                                frame_index=0)
+    assert meas_now == [centroid(200, 150, 30)]
+
+def test_select_individual_then_follows_nearest_blob():
+    final = np.zeros((300, 400, 3), dtype=np.uint8)
+    contours, meas_now = blobs()
+    meas_last = [[15, 15]] # known position, next to the small blob
+    _, meas_now = trackutils.select_individual(final, contours, meas_last,
+                                                meas_now, frame_index=1)
+    assert meas_now == [centroid(10, 10, 4)]
+
+def test_select_individual_keeps_single_blob():
+    final = np.zeros((300, 400, 3), dtype=np.uint8)
+    meas_now = [[5.0, 6.0]]
+    _, meas_now = trackutils.select_individual(final, [square(3, 4, 4)],
+                                                [[100, 100]], meas_now,
+                                                frame_index=2)
+    assert meas_now == [[5.0, 6.0]]
+
+def test_predict_positions_extrapolates_velocity():
+    meas_prev = [[10, 20], [100, 100]]
+    meas_now = [[13, 24], [100, 90]]
+    predicted = trackutils.predict_positions(meas_now, meas_prev, 2)
+    assert np.array_equal(predicted, [[16, 28], [100, 80]])
+
+def test_predict_positions_of_still_individual():
+    predicted = trackutils.predict_positions([[5, 5]], [[5, 5]], 1)
+    assert np.array_equal(predicted, [[5, 5]])
+
+def test_predict_positions_needs_two_full_frames():
+    assert trackutils.predict_positions([[1, 1]], None, 1) is None
+    assert trackutils.predict_positions([[1, 1]], [], 1) is None
+    assert trackutils.predict_positions([[1, 1]], [[0, 0]], 2) is None
+    assert trackutils.predict_positions([[1, 1], [2, 2]], [[0, 0]], 2) is None
+
+class CountingCapture(RawCamera):
+    """RawCamera that also reports timestamps, and counts queries of them."""
+
+    def __init__(self, frames, msecs):
+        super().__init__(frames)
+        self.msecs = list(msecs)
+        self.at = -1
+        self.queries = 0
+
+    def grab(self):
+        self.at += 1
+        return super().grab()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            self.queries += 1
+            return self.msecs[self.at]
+        return super().get(prop)
+
+def test_capture_records_backend_timestamps_of_decoded_frames():
+    frames = [bgr_frame()]*6
+    raw = CountingCapture(frames, [0.0, 40.0, 80.0, 120.0, 160.0, 200.0])
+    cap = trackutils.Capture(raw)
+    cap.read()
+    assert cap.msec == 0.0
+    cap.skip(2)
+    assert raw.queries == 1 # frames only grabbed are not asked about
+    cap.read()
+    assert cap.msec == 120.0
+    assert raw.queries == 2
+
+def test_capture_stops_asking_for_unreliable_timestamps():
+    raw = CountingCapture([bgr_frame()]*4, [0.0, 0.0, 80.0, 120.0])
+    cap = trackutils.Capture(raw)
+    cap.read()
+    cap.read()
+    assert cap.msec is None
+    cap.read()
+    assert cap.msec is None
+    assert raw.queries == 2
+
+def test_threaded_capture_delivers_timestamps():
+    raw = CountingCapture([bgr_frame()]*6, [10.0*i for i in range(6)])
+    capture = trackutils.ThreadedCapture(trackutils.Capture(raw), (H, W, 3),
+                                            stride=2)
+    capture.start()
+    msecs = []
+    try:
+        for _ in range(3):
+            _, frame_index, _, _, msec = capture.read(timeout=5)
+            msecs.append((frame_index, msec))
+    finally:
+        capture.stop()
+    assert msecs == [(2, 10.0), (4, 30.0), (6, 50.0)]
+    assert raw.queries == 3
@@ -0,0 +1,119 @@
+# Pranav Minasandra
+# 18 Oct 2026
+# pminasandra.github.io
+
+"""
+Tests of writing frames to video files.
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from tracktorlive import videoout
+
+H, W = 24, 32
+
+class RecordingWriter:
+    """Stands in for cv2.VideoWriter, keeping its arguments and frames."""
+
+    made = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.frames = []
+        RecordingWriter.made.append(self)
+
+    def isOpened(self):
+        return True
+
+    def write(self, frame):
+        self.frames.append(frame)
+
+    def release(self):
+        pass
+
+@pytest.fixture
+def writer(monkeypatch):
+    RecordingWriter.made = []
+    monkeypatch.setattr(videoout.cv2, "VideoWriter", RecordingWriter)
+    return RecordingWriter
+
+def frames(n, channels=None):
+    shape = (H, W) if channels is None else (H, W, channels)
+    return [np.full(shape, 40*i, dtype=np.uint8) for i in range(n)]
+
+def test_vidout_writes_mono_frames(writer):
+    mono = frames(3)
+    videoout.vidout(mono, "clip.avi", 10, (W, H), "MJPG")
+    made, = writer.made
+    assert made.kwargs["isColor"] is False
+    assert made.kwargs["frameSize"] == (W, H)
+    assert len(made.frames) == 3
+    assert all(f.shape == (H, W) for f in made.frames)
+
+def test_vidout_writes_colour_frames(writer):
+    videoout.vidout(frames(2, 3), "clip.avi", 10, (W, H), "MJPG")
+    made, = writer.made
+    assert made.kwargs["isColor"] is True
+
+def test_mono_video_file_round_trip(tmp_path):
+    filename = str(tmp_path/"mono.avi")
+    mono = frames(3)
+    videoout.vidout(mono, filename, 10, (W, H), "MJPG")
+    cap = cv2.VideoCapture(filename)
+    for expected in mono:
+        ret, frame = cap.read()
+        assert ret
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        assert np.abs(gray.astype(int) - expected).max() <= 2
+    cap.release()
+
+def test_mono_spill_round_trip(tmp_path, writer):
+    mono = frames(4)
+    spillfile, shape = videoout.spill_frames(mono, str(tmp_path))
+    assert shape == (H, W)
+    videoout.vidout_from_spill(spillfile, shape, "clip.avi", 10, (W, H),
+                                "MJPG")
+    made, = writer.made
+    assert made.kwargs["isColor"] is False
+    assert np.array_equal(np.array(made.frames), np.array(mono))
+
+def test_clip_recorder_spills_beyond_budget(tmp_path):
+    clip = frames(6)
+    frame_bytes = clip[0].nbytes
+    recorder = videoout.ClipRecorder(budget=2*frame_bytes,
+                                        spill_dir=str(tmp_path))
+    recorder.extend([None] + clip[:2])
+    assert recorder.spillfile is None
+    recorder.extend(clip[2:])
+    assert recorder.spillfile is not None
+    assert len(recorder) == 6
+    assert np.array_equal(np.array(list(recorder)), np.array(clip))
+    assert np.array_equal(recorder[-1], clip[-1])
+    with pytest.raises(IndexError):
+        recorder[6]
+    recorder.clear()
+    assert len(recorder) == 0
+    assert list(tmp_path.iterdir()) == []
+
+def test_clip_recorder_maps_spill_file_only_when_it_grew(tmp_path,
+                                                        monkeypatch):
+    maps = []
+    read_spilled = videoout.read_spilled
+    def counting_read_spilled(*args):
+        maps.append(args)
+        return read_spilled(*args)
+    monkeypatch.setattr(videoout, "read_spilled", counting_read_spilled)
+
+    clip = frames(5)
+    recorder = videoout.ClipRecorder(budget=0, spill_dir=str(tmp_path))
+    recorder.extend(clip[:4])
+    for i, frame in enumerate(recorder):
+        assert np.array_equal(frame, clip[i])
+    assert len(maps) == 1
+    recorder.append(clip[4])
+    assert np.array_equal(recorder[4], clip[4])
+    assert np.array_equal(recorder[0], clip[0])
+    assert len(maps) == 2
+    recorder.clear()
@@ -10,7 +10,6 @@ k-second buffer of tracked data.
 import glob
 import multiprocessing as mp
 import multiprocessing.shared_memory as mpshm
-from multiprocessing.managers import BaseManager
 import os
 import os.path
 from os.path import join as joinpath
@@ -21,31 +20,38 @@ import uuid
 import numpy as np
 
 import tracktorlive
+from . import memorymanagement as mmg
 from . import sync
 
-class SyncManager(BaseManager):
-    pass
-SyncManager.register('get_semaphore')
+WAIT_TIMEOUT = 0.1 # seconds, how often a waiting client checks whether to stop
 
 def _runforever(obj):
 
     # Run start casettes
+    obj.last_seq = obj.ring.seq
     data, clock = obj.get_data_and_clock()
     for func in obj.atstart:
         obj.atstart[func](data, clock)
 
+    waiter = None
+    if obj.wait_for_frames:
+        waiter = sync.FrameWaiter(obj.get_waiter_filename(),
+                                    obj.ring.header, mmg.HDR_WAITERS)
+
     # Client executes
     while obj.running.value:
         try:
-            time.sleep(obj.run_interval) #to not overload everything
+            if waiter is None:
+                time.sleep(obj.run_interval) #to not overload everything
+            else:
+                waiter.wait(WAIT_TIMEOUT)
             obj._eachiter()
         except KeyboardInterrupt:
             obj.running.value=False
             break
-        except ConnectionResetError:
-            print(f"Server: {obj.feed_id} disconnected.")
-            obj.running.value = False
-            break
+
+    if waiter is not None:
+        waiter.close()
 
     # Run stop casettes
     data, clock = obj.get_data_and_clock()
@@ -58,38 +64,52 @@ class TracktorClient:
     server.TracktorServer.
     """
 
-    def __init__(self, feed_id, run_interval=None):
+    def __init__(self, feed_id, run_interval=None, wait_for_frames=True,
+                    coalesce=False, window=None):
         """
         Initialises a TracktorClient that connects to an existing tracking server.
 
         Args:
             feed_id (str): Unique ID of the server feed to connect to.
             run_interval (float, optional): Time (in seconds) between successive calls 
-                to registered functions. Defaults to 0.005s.
+                to registered functions when not waiting for frames. Defaults to
+                0.005s.
+            wait_for_frames (bool, default=True): Sleep until the server
+                publishes a frame, and run registered functions once per
+                published frame. Falls back to polling every run_interval on
+                platforms without named pipes.
+            coalesce (bool, default=False): When waiting for frames and the
+                client falls behind, run registered functions only once on the
+                newest data instead of once for every frame missed.
+            window (int, optional): If given, registered functions receive
+                only the newest window samples instead of the whole buffer,
+                which is much cheaper to copy on long buffers.
 
         Raises:
             FileNotFoundError: If the specified feed metadata file does not exist.
-            ConnectionRefusedError: If the server cannot be contacted.
         """
 
         self.feed_id = feed_id
         self.feed_info = self.load_feed_info()
-        self.port_num = self.feed_info["port_num"]
 
         self.client_id = str(uuid.uuid4())
         self.clientfile = self.get_client_filename()
         self.make_client_file()
 
-        sync.wait_for_server((sync.ADDR, self.port_num))
-        self.manager = SyncManager(address=('127.0.0.1', self.port_num),
-                                        authkey=b'secret')
-        self.manager.connect()
-        self.semaphore = self.manager.get_semaphore(self.feed_id)
-
         self.datashm = mpshm.SharedMemory(name=self.feed_info["datashm"])
         self.clockshm = mpshm.SharedMemory(name=self.feed_info["clockshm"])
         mp.resource_tracker.unregister(self.datashm._name, 'shared_memory')
         mp.resource_tracker.unregister(self.clockshm._name, 'shared_memory')
+        self.frameshm = None
+        self.framering = None
+        if self.feed_info.get("frameshm"):
+            self.frameshm = mpshm.SharedMemory(name=self.feed_info["frameshm"])
+            mp.resource_tracker.unregister(self.frameshm._name, 'shared_memory')
+            self.framering = mmg.FrameRing(self.frameshm,
+                                            self.feed_info["frame_slots"],
+                                            self.feed_info["frame_shape"],
+                                            readonly=True
+                                        )
         self.params = self.feed_info["params"]
 
         self.fps = int(self.feed_info["fps"])
@@ -97,26 +117,22 @@ class TracktorClient:
             self.run_interval = 0.005
         else:
             self.run_interval = run_interval
+        self.wait_for_frames = wait_for_frames and sync.can_wait_for_frames()
+        self.coalesce = coalesce
+        self.window = window
+        self.last_seq = 0
 
         self.buffer_size = self.feed_info["buffer_size"]
         self.n_ind = int(self.feed_info["n_ind"])
 
-        self.dataq = np.ndarray(
-                    (
-                        self.n_ind, #number of individuals as row
-                        2, # x, y
-                        int(self.fps * self.buffer_size)
-                    ),
-                    dtype=np.float64,
-                    buffer = self.datashm.buf
-                )
-        self.clockq = np.ndarray(
-                    (
-                        int(self.fps * self.buffer_size),
-                    ),
-                    dtype=np.float64,
-                    buffer = self.clockshm.buf
-                )
+        self.ring = mmg.TrackRing(self.datashm, self.clockshm,
+                                    self.n_ind,
+                                    int(self.feed_info["ring_length"])
+                                )
+        if self.window is None:
+            self.window = self.ring.length
+        # first get_new_data() returns the whole current buffer
+        self.read_seq = max(self.ring.seq - self.ring.length, 0)
 
         self.casettes = {}
         self.atstart = {}
@@ -148,6 +164,10 @@ class TracktorClient:
         """Get feedfile for current client data"""
         return joinpath(tracktorlive.CLIENTS_DIR, f"tlclient-{self.feed_id}-{self.client_id}")
 
+    def get_waiter_filename(self):
+        """Get named pipe through which the server wakes up this client"""
+        return joinpath(tracktorlive.CLIENTS_DIR, f"tlwake-{self.feed_id}-{self.client_id}")
+
     def make_client_file(self):
         """Create a client file"""
         with open(self.clientfile, "a") as f:
@@ -159,28 +179,95 @@ class TracktorClient:
             return pickle.load(f)
 
     def get_data_and_clock(self):
-        """Semaphore protected acquire data and clock from server"""
-        self.semaphore.acquire()
-        data = self.dataq.copy()
-        clock = self.clockq.copy()
-        self.semaphore.release()
-        return data, clock
+        """
+        Lock-free acquire data and clock from server, in chronological order
+        """
+        return self.ring.ordered()
+
+    def get_window(self, n):
+        """
+        Lock-free acquire only the newest n samples of data and clock from
+        server, in chronological order
+        """
+        return self.ring.window(n)
+
+    def get_frame(self, k=0):
+        """
+        Get the k-th latest tracked frame (k=0 is the newest) shared by the
+        server, without copying. Requires a server started with share_frames.
+
+        Returns:
+            a read-only view of the frame and its sequence number, or
+            (None, -1) if that frame is not available. The view is only
+            guaranteed to be intact while frame_is_valid(seq) is True; copy it
+            if it must outlive the server's frame buffer.
+        """
+        if self.framering is None:
+            return None, -1
+        return self.framering.get(k)
+
+    def frame_is_valid(self, seq):
+        """Whether the frame with sequence number seq is still unmodified"""
+        return self.framering is not None and self.framering.is_valid(seq)
+
+    def get_skipped(self, n):
+        """
+        Lock-free acquire, for the newest n samples, how many camera frames the
+        server dropped right before each to stay on the freshest frame
+        """
+        return self.ring.skipped_window(n)
+
+    def get_new_data(self):
+        """
+        Lock-free acquire only the samples published since the previous call
+        of this method.
+
+        Returns:
+            data (n_ind, 2, k), clock (k,), the feed's sequence number (total
+            samples published so far), and the number of samples that were
+            missed because the buffer had already overwritten them.
+        """
+        data, clock, seq, gaps = self.ring.since(self.read_seq)
+        self.read_seq = seq
+        return data, clock, seq, gaps
 
     def _eachiter(self):
-        try:
-            data, clock = self.get_data_and_clock()
-            if clock[-1] > -1.0-1e-8 and clock[-1] < -1.0 + 1e-8:#
-                self.running.value = False
-            else:
-                for funcname in self.casettes:
-                    self.casettes[funcname](data, clock)
-        except EOFError:#server process died
-            print("Server died unexpectedly.")
+        if not os.path.exists(self.get_feed_filename()):#server process died
+            print(f"Server: {self.feed_id} disconnected.")
             self.running.value = False
+            return
+
+        if not self.wait_for_frames:
+            data, clock = self.get_window(self.window)
+            self._runcasettes(data, clock)
+            return
+
+        seq = self.ring.seq
+        if seq == self.last_seq:
+            return
+        if self.coalesce:
+            seqs = [seq]
+        else:
+            seqs = range(max(self.last_seq + 1, seq - self.ring.length + 1),
+                            seq + 1)
+        for upto in seqs:
+            data, clock = self.ring.window(self.window, upto)
+            self._runcasettes(data, clock)
+            if not self.running.value:
+                break
+        self.last_seq = seq
+
+    def _runcasettes(self, data, clock):
+        if clock[-1] > -1.0-1e-8 and clock[-1] < -1.0 + 1e-8:#
+            self.running.value = False
+        else:
+            for funcname in self.casettes:
+                self.casettes[funcname](data, clock)
 
     def run(self):
         """
-        Runs all registered functions at specified run interval.
+        Runs all registered functions once per published frame, or at the
+        specified run interval when not waiting for frames.
         """
         self.running = mp.Value('b', True)
         self.clientproc = mp.Process(target=_runforever, args=(self,))
@@ -203,6 +290,8 @@ class TracktorClient:
             os.remove(self.clientfile)
         self.datashm.close()
         self.clockshm.close()
+        if self.frameshm is not None:
+            self.frameshm.close()
 
 def list_feeds():
     """
@@ -214,19 +303,26 @@ def list_feeds():
 
     return glob.glob(joinpath(tracktorlive.FEEDS_DIR, "tlfeed-*"))
 
-def spawn_trclient(feed_id, run_interval=0.005):
+def spawn_trclient(feed_id, run_interval=0.005, wait_for_frames=True,
+                    coalesce=False, window=None):
     """
     Creates and returns a new TracktorClient instance.
 
     Args:
         feed_id (str): Feed ID of the server to connect to.
-        run_interval (float): Interval between iterations in seconds.
+        run_interval (float): Interval between iterations in seconds, used
+            when not waiting for frames.
+        wait_for_frames (bool): Run once per frame published by the server.
+        coalesce (bool): When behind, run only on the newest frame.
+        window (int): Pass only this many newest samples to registered
+            functions. Defaults to the whole buffer.
 
     Returns:
         TracktorClient: The initialized client.
     """
 
-    return TracktorClient(feed_id, run_interval)
+    return TracktorClient(feed_id, run_interval, wait_for_frames, coalesce,
+                            window)
 
 def close_trclient(client):
     """
@@ -8,9 +8,487 @@ Utilities for shared memory handling and associated stuff
 
 import multiprocessing.shared_memory as mpshm
 
+import numpy as np
+
+from . import sync
+
+# The clock segment begins with a small header of int64 values, followed by
+# the clock ring itself, and then a ring of int64 metadata holding, per sample,
+# how many camera frames were dropped before it. Header fields are addressed
+# by the HDR_* indices.
+HEADER_LENGTH = 8
+HEADER_SIZE = HEADER_LENGTH*np.dtype(np.int64).itemsize
+HDR_SEQ = 0 # number of samples published so far
+HDR_HEAD = 1 # ring index of the newest sample, -1 if nothing published yet
+HDR_LOCK = 2 # seqlock counter, odd while the server is writing
+HDR_TAKEN = 3 # number of frames taken off a FrameQueue
+HDR_DROPPED = 4 # number of frames a FrameQueue had no room for
+HDR_STATE = 5 # state of a FrameQueue's consumer, see QUEUE_*
+HDR_WAITERS = 6 # changes whenever a client starts waiting for frames
+
+QUEUE_STARTING = 0
+QUEUE_RUNNING = 1
+QUEUE_CLOSED = 2 # producer is done; consumer drains what is left
+QUEUE_FAILED = -1
+
 def create_shared_data(size):
     """
     Deals with the creation and setup of a shared memory object.
     """
     shm = mpshm.SharedMemory(create=True, size=size)
     return shm
+
+def trackring_sizes(n_ind, length):
+    """
+    Returns sizes in bytes of the data and clock shared memories needed for a
+    TrackRing.
+    """
+    floatsize = np.dtype(np.float64).itemsize
+    intsize = np.dtype(np.int64).itemsize
+    datasize = n_ind*2*length*floatsize
+    clocksize = HEADER_SIZE + length*floatsize + length*intsize
+    return datasize, clocksize
+
+class TrackRing:
+    """
+    Circular buffer of tracking data and timestamps in shared memory.
+
+    Each published sample is written in place at the slot after the current
+    head, so publishing costs O(n_ind) regardless of buffer length. The header
+    in the clock segment holds the head index and a sequence counter, which
+    readers use to restore chronological order. Reads are guarded by a seqlock
+    (see sync.SeqLock), so readers never block the server.
+    """
+
+    def __init__(self, datashm, clockshm, n_ind, length):
+        """
+        Args:
+            datashm (SharedMemory): segment holding (n_ind, 2, length) float64.
+            clockshm (SharedMemory): segment holding the header, (length,)
+                float64 clock and (length,) int64 skipped-frame counts.
+            n_ind (int): number of individuals.
+            length (int): number of samples held in the ring.
+        """
+        self.n_ind = n_ind
+        self.length = length
+        self.header = np.ndarray((HEADER_LENGTH,),
+                            dtype=np.int64,
+                            buffer=clockshm.buf
+                        )
+        self.data = np.ndarray((n_ind, 2, length),
+                            dtype=np.float64,
+                            buffer=datashm.buf
+                        )
+        self.clock = np.ndarray((length,),
+                            dtype=np.float64,
+                            buffer=clockshm.buf,
+                            offset=HEADER_SIZE
+                        )
+        self.skipped = np.ndarray((length,),
+                            dtype=np.int64,
+                            buffer=clockshm.buf,
+                            offset=HEADER_SIZE + self.clock.nbytes
+                        )
+        self.lock = sync.SeqLock(self.header, HDR_LOCK)
+
+    @property
+    def seq(self):
+        """Number of samples published so far."""
+        return int(self.header[HDR_SEQ])
+
+    @property
+    def head(self):
+        """Ring index of the newest sample, -1 if none published yet."""
+        return int(self.header[HDR_HEAD])
+
+    def reset(self):
+        """Fills the ring with NaNs and forgets all published samples."""
+        self.data[:,:,:] = np.nan
+        self.clock[:] = np.nan
+        self.skipped[:] = 0
+        self.header[:] = 0
+        self.header[HDR_HEAD] = -1
+
+    def push(self, points, t, skipped=0):
+        """
+        Publishes one sample.
+
+        Args:
+            points (array-like): up to n_ind (x, y) positions. Individuals not
+                given are stored as -1.0.
+            t (float): timestamp of the sample.
+            skipped (int): number of frames dropped since the previous sample.
+        """
+        seq = self.seq
+        slot = seq % self.length
+
+        self.lock.acquire_write()
+        self.data[:,:,slot] = -1.0
+        if len(points) > 0:
+            points = points[:self.n_ind]
+            self.data[:len(points),:,slot] = points
+        self.clock[slot] = t
+        self.skipped[slot] = skipped
+
+        self.header[HDR_HEAD] = slot
+        self.header[HDR_SEQ] = seq + 1
+        self.lock.release_write()
+
+    def latest(self):
+        """Returns a copy of the newest positions and their timestamp."""
+        return self.lock.read(self._latest)
+
+    def _latest(self):
+        head = self.head
+        return self.data[:,:,head].copy(), self.clock[head]
+
+    def ordered(self, upto=None):
+        """
+        Returns copies of data and clock in chronological order, newest last,
+        i.e., the layout expected by cassettes.
+
+        Args:
+            upto (int, optional): return the buffer as it was when only upto
+                samples had been published. Samples overwritten since then are
+                NaN. Defaults to the current state.
+        """
+        return self.lock.read(self._window, self.length, upto)
+
+    def window(self, n, upto=None):
+        """
+        Returns copies of only the newest n samples of data and clock, in
+        chronological order. Same as ordered()[..., -n:], but copies only n
+        samples.
+
+        Args:
+            n (int): number of samples, at most the ring length.
+            upto (int, optional): see ordered().
+        """
+        return self.lock.read(self._window, n, upto)
+
+    def _window(self, n, upto=None):
+        seq = self.seq
+        if upto is None:
+            upto = seq
+        n = min(n, self.length)
+        end = upto % self.length # one past the newest sample asked for
+        data = self._tail(self.data, n, end)
+        clock = self._tail(self.clock, n, end)
+
+        # oldest slots of the window may since have been overwritten
+        stale = min(n, seq - self.length - (upto - n))
+        if stale > 0:
+            data[:,:,:stale] = np.nan
+            clock[:stale] = np.nan
+        return data, clock
+
+    @staticmethod
+    def _tail(arr, n, end):
+        # copy of the n entries before index end along the last axis, wrapping
+        if n <= end:
+            return arr[...,end-n:end].copy()
+        return np.concatenate((arr[...,end-n:], arr[...,:end]), axis=-1)
+
+    def skipped_window(self, n):
+        """
+        Returns, for the newest n samples in chronological order, how many
+        frames were dropped before each of them.
+        """
+        return self.lock.read(self._skipped_window, n)
+
+    def _skipped_window(self, n):
+        return self._tail(self.skipped, min(n, self.length),
+                            self.seq % self.length)
+
+    def since(self, last_seq):
+        """
+        Returns samples published after the first last_seq samples.
+
+        Args:
+            last_seq (int): sequence number returned by a previous call, or
+                0 to get everything.
+
+        Returns:
+            data (n_ind, 2, k), clock (k,), current sequence number, and the
+            number of samples missed because they were already overwritten.
+        """
+        return self.lock.read(self._since, last_seq)
+
+    def _since(self, last_seq):
+        seq = self.seq
+        new = seq - last_seq
+        gaps = max(new - self.length, 0)
+        data, clock = self._window(new - gaps)
+        return data, clock, seq, gaps
+
+def framering_size(n_slots, shape):
+    """
+    Returns size in bytes of the shared memory needed for a FrameRing.
+    """
+    intsize = np.dtype(np.int64).itemsize
+    return HEADER_SIZE + n_slots*intsize + n_slots*int(np.prod(shape))
+
+class FrameRing:
+    """
+    Circular buffer of uint8 video frames in a single shared memory segment.
+
+    Layout: a header like TrackRing's, one int64 per slot holding the sequence
+    number of the frame stored there, and then the frames. Frame sequence
+    numbers count from 1 and match TrackRing sequence numbers when the server
+    publishes one frame per sample.
+
+    Readers get views into shared memory, not copies. A view stays correct
+    until the server reuses its slot, which is_valid() detects.
+    """
+
+    def __init__(self, shm, n_slots, shape, readonly=False):
+        """
+        Args:
+            shm (SharedMemory): segment of at least framering_size() bytes.
+            n_slots (int): number of frames held.
+            shape (tuple): shape of one frame, e.g. (height, width, 3).
+            readonly (bool): whether returned views should be read-only.
+        """
+        self.n_slots = n_slots
+        self.shape = tuple(shape)
+        intsize = np.dtype(np.int64).itemsize
+        self.header = np.ndarray((HEADER_LENGTH,),
+                            dtype=np.int64,
+                            buffer=shm.buf
+                        )
+        self.slotseq = np.ndarray((n_slots,),
+                            dtype=np.int64,
+                            buffer=shm.buf,
+                            offset=HEADER_SIZE
+                        )
+        self.frames = np.ndarray((n_slots, *self.shape),
+                            dtype=np.uint8,
+                            buffer=shm.buf,
+                            offset=HEADER_SIZE + n_slots*intsize
+                        )
+        if readonly:
+            self.frames.flags.writeable = False
+
+    @property
+    def seq(self):
+        """Number of frames published so far."""
+        return int(self.header[HDR_SEQ])
+
+    def reset(self):
+        """Forgets all published frames."""
+        self.header[:] = 0
+        self.header[HDR_HEAD] = -1
+        self.slotseq[:] = 0
+
+    def next_slot(self):
+        """
+        Returns a writable view of the slot the next frame goes into, and marks
+        that slot as being written (writer only).
+        """
+        slot = self.seq % self.n_slots
+        self.slotseq[slot] = -1
+        return self.frames[slot]
+
+    def publish(self):
+        """Publishes the frame written into next_slot() (writer only)."""
+        seq = self.seq
+        slot = seq % self.n_slots
+        self.slotseq[slot] = seq + 1
+        self.header[HDR_HEAD] = slot
+        self.header[HDR_SEQ] = seq + 1
+
+    def get(self, k=0):
+        """
+        Returns a view of the k-th latest frame (0 is the newest) and its
+        sequence number, or (None, -1) if that frame is not available.
+        """
+        seq = self.seq - k
+        if seq < 1 or k >= self.n_slots:
+            return None, -1
+        slot = (seq - 1) % self.n_slots
+        if self.slotseq[slot] != seq:# overwritten already
+            return None, -1
+        return self.frames[slot], seq
+
+    def is_valid(self, seq):
+        """Whether the frame with sequence number seq is still in its slot."""
+        return seq > 0 and self.slotseq[(seq - 1) % self.n_slots] == seq
+
+class FrameHistory:
+    """
+    Fixed-length history of video frames backed by one preallocated array, so
+    that keeping a history allocates nothing per frame.
+
+    Indexing works like the list of frames it replaces: [-1] is the newest
+    frame, [0] the oldest, and positions not filled yet are None. Returned
+    frames are views that get overwritten once they leave the history; copy
+    them to keep them longer. One spare slot holds the frame being worked on,
+    see next_slot().
+    """
+
+    def __init__(self, length, shape, dtype=np.uint8):
+        """
+        Args:
+            length (int): number of frames held.
+            shape (tuple): shape of one frame, e.g. (height, width, 3).
+            dtype: frame dtype.
+        """
+        self.length = length
+        self.shape = tuple(shape)
+        self.frames = np.zeros((length + 1, *self.shape), dtype=dtype)
+        self.count = 0 # frames published so far
+
+    def next_slot(self):
+        """
+        Returns the slot the next frame goes into. It is not part of the
+        history until publish() is called.
+        """
+        return self.frames[self.count % (self.length + 1)]
+
+    def publish(self, frame=None):
+        """
+        Appends the next frame to the history.
+
+        Args:
+            frame (np.ndarray, optional): frame to store, if it was not
+                written straight into next_slot().
+        """
+        slot = self.next_slot()
+        if frame is not None and not np.may_share_memory(frame, slot):
+            np.copyto(slot, frame)
+        self.count += 1
+
+    def _slot(self, i):
+        if not -self.length <= i < self.length:
+            raise IndexError("frame history index out of range")
+        if i < 0:
+            i += self.length
+        num = self.count - self.length + i # index of frame since start
+        if num < 0:
+            return None
+        return num % (self.length + 1)
+
+    def __getitem__(self, i):
+        slot = self._slot(i)
+        if slot is None:
+            return None
+        return self.frames[slot]
+
+    def __setitem__(self, i, frame):
+        slot = self._slot(i)
+        if slot is None:
+            raise IndexError("no frame stored at this position yet")
+        if not np.may_share_memory(frame, self.frames[slot]):
+            np.copyto(self.frames[slot], frame)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self[i]
+
+def framequeue_size(n_slots, shape):
+    """
+    Returns size in bytes of the shared memory needed for a FrameQueue.
+    """
+    return HEADER_SIZE + n_slots*int(np.prod(shape))
+
+class FrameQueue:
+    """
+    Bounded queue of uint8 video frames in a single shared memory segment,
+    from one producer process to one consumer process.
+
+    Layout: a header like TrackRing's, and then the frame slots. The producer
+    copies a frame into the slot after the newest and then counts it as put
+    (HDR_SEQ); the consumer uses the oldest frame in place and then counts it
+    as taken (HDR_TAKEN). Neither ever waits for the other inside the queue:
+    put() fails when all slots are full, and peek() returns None when none
+    is.
+    """
+
+    def __init__(self, shm, n_slots, shape):
+        """
+        Args:
+            shm (SharedMemory): segment of at least framequeue_size() bytes.
+            n_slots (int): number of frames held.
+            shape (tuple): shape of one frame, e.g. (height, width, 3).
+        """
+        self.n_slots = n_slots
+        self.shape = tuple(shape)
+        self.header = np.ndarray((HEADER_LENGTH,),
+                            dtype=np.int64,
+                            buffer=shm.buf
+                        )
+        self.frames = np.ndarray((n_slots, *self.shape),
+                            dtype=np.uint8,
+                            buffer=shm.buf,
+                            offset=HEADER_SIZE
+                        )
+
+    def reset(self):
+        """Empties the queue and clears its counters."""
+        self.header[:] = 0
+        self.header[HDR_HEAD] = -1
+
+    @property
+    def put_count(self):
+        """Number of frames put so far."""
+        return int(self.header[HDR_SEQ])
+
+    @property
+    def taken(self):
+        """Number of frames taken so far."""
+        return int(self.header[HDR_TAKEN])
+
+    @property
+    def dropped(self):
+        """Number of frames counted with drop()."""
+        return int(self.header[HDR_DROPPED])
+
+    @property
+    def depth(self):
+        """Number of frames waiting in the queue."""
+        return self.put_count - self.taken
+
+    @property
+    def state(self):
+        return int(self.header[HDR_STATE])
+
+    @state.setter
+    def state(self, value):
+        self.header[HDR_STATE] = value
+
+    def put(self, frame):
+        """
+        Copies frame into the queue (producer only).
+
+        Returns:
+            False if the queue is full and frame was not put, else True.
+        """
+        seq = self.put_count
+        if seq - self.taken >= self.n_slots:
+            return False
+        slot = seq % self.n_slots
+        np.copyto(self.frames[slot], frame)
+        self.header[HDR_HEAD] = slot
+        self.header[HDR_SEQ] = seq + 1
+        return True
+
+    def drop(self):
+        """Counts one frame that was not put for lack of room (producer only)."""
+        self.header[HDR_DROPPED] += 1
+
+    def peek(self):
+        """
+        Returns a view of the oldest frame in the queue, or None if it is empty
+        (consumer only). The frame stays in the queue until pop().
+        """
+        taken = self.taken
+        if taken >= self.put_count:
+            return None
+        return self.frames[taken % self.n_slots]
+
+    def pop(self):
+        """Frees the slot of the oldest frame (consumer only)."""
+        self.header[HDR_TAKEN] += 1
@@ -131,6 +131,8 @@ def gui_set_params(cap,
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
     if not cap.isOpened():
         raise IOError("Failed to open video source.")
+    if not isinstance(cap, tru.Capture):
+        cap = tru.Capture(cap, timestamps=False)
 
     # Initial parameters, with fallback if config is missing any keys
     if initial_config is None:
@@ -169,11 +171,11 @@ def gui_set_params(cap,
     while True:
         if not is_paused:
             try:
-                frame, frame_index = tru.get_frame(cap)
+                frame, frame_index = cap.read()
             except:
                 print("Video complete. Looping back to the start.")
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                frame, frame_index = tru.get_frame(cap)
+                cap.seek(0)
+                frame, frame_index = cap.read()
                 
             cv2.setTrackbarPos('Seek', 'Tracking Parameters', int(frame_index))
 
@@ -181,9 +183,9 @@ def gui_set_params(cap,
             # If paused and user moves the trackbar, fetch frame at that index
             seek_pos = cv2.getTrackbarPos('Seek', 'Tracking Parameters')
             if seek_pos != frame_index:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, seek_pos)
+                cap.seek(seek_pos)
                 try:
-                    frame, frame_index = tru.get_frame(cap)
+                    frame, frame_index = cap.read()
                 except:
                     print("Video complete")
 
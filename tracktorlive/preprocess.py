@@ -0,0 +1,173 @@
+# Pranav Minasandra
+# 18 Oct 2026
+# pminasandra.github.io
+
+"""
+Declarative preprocessing of frames before detection, replacing per-frame
+masking, channel, contrast and blur cassettes.
+
+A chain is a list of steps, each a dict with a "step" key:
+
+    {"step": "mask", "circle": [x, y, radius]}
+    {"step": "mask", "rectangle": [x0, y0, x1, y1]}
+    {"step": "mask", "image": "mask.png"}   # white is kept, black masked
+    {"step": "crop", "box": [x0, y0, x1, y1]}
+    {"step": "channel", "channel": 0}       # Blue: 0 | Green: 1 | Red: 2
+    {"step": "contrast", "alpha": 1.8, "beta": 0}
+    {"step": "blur", "ksize": 21, "sigma": 0}
+
+Mask steps take an optional "fill" (default 0), the value masked pixels are
+set to. The chain is compiled once: masks are combined into a single mask,
+contrast steps into a single lookup table, and frames are cropped to the
+bounding box of the mask (and any crop box), so that pixels outside it are
+never processed. Whatever the order of steps, they are applied as crop,
+channel, contrast, mask, blur.
+"""
+
+import cv2
+import numpy as np
+
+STEPS = ("mask", "crop", "channel", "contrast", "blur")
+
+def _mask_from_step(step, shape):
+    H, W = shape[:2]
+    mask = np.zeros((H, W), dtype=np.uint8)
+    if "circle" in step:
+        x, y, r = step["circle"]
+        cv2.circle(mask, (int(x), int(y)), int(r), 255, -1)
+    elif "rectangle" in step:
+        x0, y0, x1, y1 = step["rectangle"]
+        cv2.rectangle(mask, (int(x0), int(y0)), (int(x1), int(y1)), 255, -1)
+    elif "image" in step:
+        image = cv2.imread(step["image"], cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise FileNotFoundError(f"could not read mask image: {step['image']}")
+        if image.shape != (H, W):
+            raise ValueError(f"mask image is {image.shape[1]}x{image.shape[0]},"
+                                f" frames are {W}x{H}")
+        mask[image > 127] = 255
+    else:
+        raise ValueError(f"mask step needs a circle, rectangle or image: {step}")
+    return mask
+
+class Preprocessor:
+    """
+    A compiled preprocessing chain (see module docstring) for frames of one
+    shape. Intermediate images are written into buffers allocated once, at
+    the size of the cropped region.
+    """
+
+    def __init__(self, steps, shape, pad=0):
+        """
+        Args:
+            steps (list): steps of the chain, as dicts.
+            shape (tuple): shape of frames, e.g. (480, 640, 3).
+            pad (int): pixels by which the cropped region is widened beyond
+                the mask, so that filters applied later (e.g. adaptive
+                thresholding) see the mask's edges as they are in the full
+                frame.
+
+        Raises:
+            ValueError: for unknown or malformed steps, or if nothing of the
+                frame is left to process.
+        """
+        H, W = shape[:2]
+        self.shape = tuple(shape)
+        mask = None
+        fill = 0
+        box = [0, 0, W, H]
+        self.channel = None
+        self.lut = None
+        self.ksize = None
+        self.sigma = 0
+
+        for step in steps:
+            kind = step.get("step")
+            if kind not in STEPS:
+                raise ValueError(f"unknown preprocessing step: {step}")
+            if kind == "mask":
+                new = _mask_from_step(step, shape)
+                mask = new if mask is None else cv2.bitwise_and(mask, new)
+                fill = step.get("fill", fill)
+            elif kind == "crop":
+                x0, y0, x1, y1 = step["box"]
+                box = [max(box[0], x0), max(box[1], y0),
+                        min(box[2], x1), min(box[3], y1)]
+            elif kind == "channel":
+                if len(shape) < 3:
+                    raise ValueError("channel step needs colour frames")
+                self.channel = int(step["channel"])
+            elif kind == "contrast":
+                # successive contrast steps compose into one table
+                levels = np.arange(256) if self.lut is None else self.lut
+                levels = levels*step.get("alpha", 1.0) + step.get("beta", 0)
+                self.lut = np.clip(np.round(levels), 0, 255).astype(np.uint8)
+            elif kind == "blur":
+                self.ksize = int(step.get("ksize", 5)) | 1
+                self.sigma = step.get("sigma", 0)
+
+        if mask is not None:
+            mx, my, mw, mh = cv2.boundingRect(mask)
+            box = [max(box[0], mx - pad), max(box[1], my - pad),
+                    min(box[2], mx + mw + pad), min(box[3], my + mh + pad)]
+        x0, y0, x1, y1 = [int(v) for v in box]
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError("preprocessing leaves nothing of the frame")
+        self.box = (x0, y0, x1, y1)
+
+        h, w = y1 - y0, x1 - x0
+        channels = () if len(shape) < 3 or self.channel is not None\
+                        else tuple(shape[2:])
+        self.buffers = {}
+        if self.channel is not None or self.lut is not None:
+            self.buffers["levels"] = np.zeros((h, w, *channels), dtype=np.uint8)
+        self.mask = None
+        if mask is not None and not mask[y0:y1, x0:x1].all():
+            self.mask = mask[y0:y1, x0:x1].copy()
+            # masked pixels of this buffer are never written to again
+            self.buffers["masked"] = np.full((h, w, *channels), fill,
+                                                dtype=np.uint8)
+        if self.ksize is not None and self.ksize > 1:
+            self.buffers["blurred"] = np.zeros((h, w, *channels), dtype=np.uint8)
+
+    def apply(self, frame, window=None):
+        """
+        Preprocesses frame, or only the part of it within window.
+
+        Args:
+            frame (np.ndarray): frame of the shape given at compilation.
+            window (tuple, optional): (x0, y0, x1, y1) part of the frame
+                wanted.
+
+        Returns:
+            image, x0, y0: the processed region (clipped to the cropped
+            region), and the position of its top-left pixel in the frame.
+            image is None if window lies outside the cropped region. It is
+            a view into a buffer (or into frame) overwritten by the next call.
+        """
+        bx0, by0, bx1, by1 = self.box
+        if window is not None:
+            wx0, wy0, wx1, wy1 = window
+            bx0, by0 = max(bx0, wx0), max(by0, wy0)
+            bx1, by1 = min(bx1, wx1), min(by1, wy1)
+            if bx1 <= bx0 or by1 <= by0:
+                return None, bx0, by0
+        # slices of buffers, which span the whole cropped region
+        region = (slice(by0 - self.box[1], by1 - self.box[1]),
+                    slice(bx0 - self.box[0], bx1 - self.box[0]))
+
+        image = frame[by0:by1, bx0:bx1]
+        if self.channel is not None:
+            image = cv2.extractChannel(image, self.channel,
+                                        dst=self.buffers["levels"][region])
+        if self.lut is not None:
+            image = cv2.LUT(image, self.lut, dst=self.buffers["levels"][region])
+        if self.mask is not None:
+            image = cv2.copyTo(image, self.mask[region],
+                                dst=self.buffers["masked"][region])
+        if "blurred" in self.buffers:
+            image = cv2.GaussianBlur(image, (self.ksize, self.ksize),
+                                        self.sigma,
+                                        borderType=cv2.BORDER_REPLICATE,
+                                        dst=self.buffers["blurred"][region])
+        return image, bx0, by0
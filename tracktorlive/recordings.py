@@ -0,0 +1,371 @@
+# Pranav Minasandra
+# 18 Oct 2026
+# pminasandra.github.io
+
+"""
+Storage of tracks: binary logs written on-the-fly, and sessions of tracks
+kept in memory and dumped at once.
+
+A log starts with a fixed-size header (a magic string followed by JSON
+metadata), and then holds one fixed-width record per tracked frame: the
+clock, the frame index, and the (n_ind, 2) positions of individuals. Records
+are gathered in memory in chunks, which a thread writes out whenever one
+fills, or every flush_interval seconds, so that the tracking loop only copies
+a few numbers per frame. Logs are read back as memory maps (read_tracklog),
+and exported to CSV (export_csv).
+
+A session (Recording.save) is an uncompressed .npz file with one array per
+column: "clock", "frame" and "points", and a JSON "header". np.load reads
+it as it is, and read_session memory-maps its columns.
+"""
+
+import json
+import os
+import queue
+import struct
+import threading
+import zipfile
+
+import numpy as np
+
+MAGIC = b"TLTRACKS"
+HEADER_SIZE = 4096 # bytes, including MAGIC; records start here
+EXTENSION = ".tltracks"
+CHUNK_SIZE = 1024 # records
+FLUSH_INTERVAL = 1.0 # seconds
+CSV_ROWS = 100000 # records exported at a time
+# significant digits that let a float be read back exactly, by precision
+CSV_DIGITS = {"f8": 17, "f4": 9}
+INITIAL_CAPACITY = 1024 # samples
+
+def record_dtype(n_ind, precision="f8"):
+    """
+    Returns the numpy dtype of one record of a log.
+
+    Args:
+        n_ind (int): number of individuals tracked.
+        precision (str): "f8" or "f4", type in which positions are stored.
+    """
+    return np.dtype([("clock", "<f8"),
+                        ("frame", "<i8"),
+                        ("points", "<" + precision, (n_ind, 2))])
+
+def _header_bytes(header):
+    text = json.dumps(header).encode()
+    if len(MAGIC) + len(text) + 1 > HEADER_SIZE:
+        raise ValueError("track log metadata too large")
+    return MAGIC + text.ljust(HEADER_SIZE - len(MAGIC) - 1) + b"\n"
+
+class TrackLog:
+    """
+    Appends records of tracks to a binary log (see module docstring). Call
+    start() in the process that appends, and close() when done.
+    """
+
+    def __init__(self, filename, n_ind, precision="f8",
+                    chunk_size=CHUNK_SIZE, flush_interval=FLUSH_INTERVAL,
+                    metadata=None):
+        """
+        Args:
+            filename (str): path of the log, overwritten if it exists.
+            n_ind (int): number of individuals tracked.
+            precision (str): "f8" or "f4", type in which positions are
+                stored.
+            chunk_size (int): records written out together.
+            flush_interval (float): seconds after which records are written
+                out even if their chunk is not yet full.
+            metadata (dict, optional): JSON-serialisable information stored
+                in the header, e.g. fps.
+        """
+        self.filename = filename
+        self.n_ind = n_ind
+        self.dtype = record_dtype(n_ind, precision)
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+
+        header = dict(metadata or {})
+        header.update(n_ind=n_ind, precision=precision)
+        self.file = open(filename, "wb")
+        self.file.write(_header_bytes(header))
+        self.file.flush()
+
+        self.lock = threading.Lock() # guards chunk and count
+        self.chunk = np.zeros(chunk_size, dtype=self.dtype)
+        self.count = 0
+        self.written = 0
+        self.full = queue.Queue()
+        self.free = queue.Queue()
+        self.thread = None
+
+    def start(self):
+        """Starts the writer thread."""
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def append(self, points, t, frame_index=-1):
+        """
+        Adds one record.
+
+        Args:
+            points (array-like): (n_ind, 2) positions of individuals.
+            t (float): clock of the sample.
+            frame_index (int): index of the tracked frame.
+        """
+        with self.lock:
+            self.chunk[self.count] = (t, frame_index, points)
+            self.count += 1
+            if self.count == self.chunk_size:
+                self._hand_over()
+
+    def _hand_over(self):
+        # lock must be held
+        self.full.put((self.chunk, self.count))
+        try:
+            self.chunk = self.free.get_nowait()
+        except queue.Empty:# writer is behind, don't wait for it
+            self.chunk = np.zeros(self.chunk_size, dtype=self.dtype)
+        self.count = 0
+
+    def _write(self, chunk, n):
+        self.file.write(chunk[:n].tobytes())
+        self.file.flush()
+        self.written += n
+        self.free.put(chunk)
+
+    def _run(self):
+        while True:
+            try:
+                item = self.full.get(timeout=self.flush_interval)
+            except queue.Empty:
+                with self.lock:
+                    if self.count > 0:
+                        self._hand_over()
+                continue
+            if item is None:
+                break
+            self._write(*item)
+
+    def close(self):
+        """Writes out all remaining records and closes the log."""
+        with self.lock:
+            if self.count > 0:
+                self._hand_over()
+        if self.thread is not None:
+            self.full.put(None)
+            self.thread.join()
+            self.thread = None
+        else:
+            while not self.full.empty():
+                self._write(*self.full.get())
+        self.file.close()
+
+def read_header(filename):
+    """Returns the metadata stored in the header of a log, as a dict."""
+    with open(filename, "rb") as f:
+        head = f.read(HEADER_SIZE)
+    if not head.startswith(MAGIC):
+        raise ValueError(f"{filename} is not a track log")
+    return json.loads(head[len(MAGIC):].decode())
+
+def read_tracklog(filename, mmap=True):
+    """
+    Reads a log, also while it is still being written.
+
+    Args:
+        filename (str): path of the log.
+        mmap (bool): memory-map records instead of loading them.
+
+    Returns:
+        records, header: a structured array with fields "clock", "frame" and
+        "points" (shape (n, n_ind, 2)), and the metadata of the log.
+    """
+    header = read_header(filename)
+    dtype = record_dtype(header["n_ind"], header["precision"])
+    # a record being written as we read is left out
+    n = (os.path.getsize(filename) - HEADER_SIZE)//dtype.itemsize
+    if n <= 0:
+        return np.zeros(0, dtype=dtype), header
+    if mmap:
+        records = np.memmap(filename, dtype=dtype, mode="r",
+                            offset=HEADER_SIZE, shape=(n,))
+    else:
+        records = np.fromfile(filename, dtype=dtype, count=n,
+                                offset=HEADER_SIZE)
+    return records, header
+
+def export_csv(filename, csvfile=None):
+    """
+    Exports a log to CSV, with columns time, x0, y0, x1, y1, ... Values are
+    written with as many digits as it takes to read them back exactly.
+
+    Args:
+        filename (str): path of the log.
+        csvfile (str, optional): path of the CSV file. Defaults to that of
+            the log, with extension .csv.
+
+    Returns:
+        path of the CSV file.
+    """
+    records, header = read_tracklog(filename)
+    if csvfile is None:
+        csvfile = os.path.splitext(filename)[0] + ".csv"
+    n_ind = header["n_ind"]
+    fmt = ["%.17g"] + [f"%.{CSV_DIGITS[header['precision']]}g"]*(2*n_ind)
+    cols = ["time"]
+    for i in range(n_ind):
+        cols.extend([f"x{i}", f"y{i}"])
+
+    with open(csvfile, "w") as f:
+        print(",".join(cols), file=f)
+        for start in range(0, len(records), CSV_ROWS):
+            part = records[start:start + CSV_ROWS]
+            table = np.column_stack((part["clock"],
+                                    part["points"].reshape(len(part), -1)))
+            np.savetxt(f, table, delimiter=",", fmt=fmt)
+    return csvfile
+
+class Recording:
+    """
+    Tracks kept in memory, in contiguous arrays that double in size whenever
+    they fill up.
+    """
+
+    def __init__(self, n_ind, capacity=INITIAL_CAPACITY):
+        """
+        Args:
+            n_ind (int): number of individuals tracked.
+            capacity (int): number of samples room is first made for.
+        """
+        self.n_ind = n_ind
+        self.initial_capacity = capacity
+        self.clear()
+
+    def clear(self):
+        """Forgets all samples and releases the memory they took."""
+        self.count = 0
+        self._clock = np.empty(self.initial_capacity)
+        self._frame = np.empty(self.initial_capacity, dtype=np.int64)
+        self._points = np.empty((self.initial_capacity, self.n_ind, 2))
+
+    def __len__(self):
+        return self.count
+
+    def _reserve(self, n):
+        needed = self.count + n
+        if needed <= len(self._clock):
+            return
+        capacity = max(2*len(self._clock), needed)
+        for name in ("_clock", "_frame", "_points"):
+            old = getattr(self, name)
+            new = np.empty((capacity, *old.shape[1:]), dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def append(self, points, t, frame_index=-1):
+        """
+        Adds one sample.
+
+        Args:
+            points (array-like): (n_ind, 2) positions of individuals.
+            t (float): clock of the sample.
+            frame_index (int): index of the tracked frame, -1 if unknown.
+        """
+        self._reserve(1)
+        self._clock[self.count] = t
+        self._frame[self.count] = frame_index
+        self._points[self.count] = points
+        self.count += 1
+
+    def extend(self, points, times, frames=None):
+        """
+        Adds several samples.
+
+        Args:
+            points (array-like): (n, n_ind, 2) positions of individuals.
+            times (array-like): (n,) clock of each sample.
+            frames (array-like, optional): (n,) frame indices, -1 (unknown)
+                by default.
+        """
+        n = len(times)
+        self._reserve(n)
+        self._clock[self.count:self.count + n] = times
+        self._frame[self.count:self.count + n] = -1 if frames is None\
+                                                    else frames
+        self._points[self.count:self.count + n] = points
+        self.count += n
+
+    # views of the samples so far, which do not see samples added later
+    @property
+    def clock(self):
+        return self._clock[:self.count]
+
+    @property
+    def frame(self):
+        return self._frame[:self.count]
+
+    @property
+    def points(self):
+        return self._points[:self.count]
+
+    def save(self, filename, metadata=None):
+        """
+        Writes the samples to a session file (see module docstring).
+
+        Args:
+            filename (str): path of the file; ".npz" is appended if missing.
+            metadata (dict, optional): JSON-serialisable information stored
+                in the header, e.g. fps.
+
+        Returns:
+            path of the file.
+        """
+        if not filename.endswith(".npz"):
+            filename += ".npz"
+        header = dict(metadata or {})
+        header.update(n_ind=self.n_ind, samples=self.count)
+        np.savez(filename, clock=self.clock, frame=self.frame,
+                    points=self.points, header=np.array(json.dumps(header)))
+        return filename
+
+def _npz_member_offset(f, info):
+    # data of an uncompressed zip member starts after its local file header
+    f.seek(info.header_offset)
+    local = f.read(30)
+    name_len, extra_len = struct.unpack("<HH", local[26:30])
+    return info.header_offset + 30 + name_len + extra_len
+
+def read_session(filename, mmap=True):
+    """
+    Reads a session file written by Recording.save.
+
+    Args:
+        filename (str): path of the file.
+        mmap (bool): memory-map columns instead of loading them.
+
+    Returns:
+        columns, header: a dict of arrays "clock", "frame" and "points", and
+        the metadata of the session.
+    """
+    columns = {}
+    with zipfile.ZipFile(filename) as zf, open(filename, "rb") as f:
+        for info in zf.infolist():
+            name = info.filename[:-len(".npy")]
+            if name == "header" or not mmap\
+                    or info.compress_type != zipfile.ZIP_STORED:
+                with zf.open(info) as member:
+                    columns[name] = np.lib.format.read_array(member)
+                continue
+            f.seek(_npz_member_offset(f, info))
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            if np.prod(shape) == 0:
+                columns[name] = np.zeros(shape, dtype=dtype)
+                continue
+            columns[name] = np.memmap(filename, dtype=dtype, mode="r",
+                                        offset=f.tell(), shape=shape,
+                                        order="F" if fortran else "C")
+    header = json.loads(str(columns.pop("header")))
+    return columns, header
@@ -8,14 +8,13 @@ provides class TracktorServer, for underlying tracking and dataserving needs
 
 import glob
 import multiprocessing as mp
-from multiprocessing.managers import BaseManager
 
 import os
 from os.path import join as joinpath
 import pickle
-import random
 import time
 import ulid
+import warnings
 
 import cv2
 import numpy as np
@@ -24,22 +23,40 @@ import tracktorlive
 from . import client
 from . import config
 from . import memorymanagement as mmg
+from . import recordings
+from . import splitting
 from . import sync
 from . import trackutils
 from . import videoout
 
-ADDR='127.0.0.1'
-class SyncManager(BaseManager): pass
-SyncManager.register('get_semaphore')
-
+CAPTURE_TIMEOUT = 0.5 # seconds to wait for a frame before checking for stops
 
 def _runforever(server):
-    server.cap = trackutils.get_vid(server.vidinput)
-    server.cap.set(cv2.CAP_PROP_FRAME_WIDTH, server.width)
-    server.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, server.height)
-    databuffer, clockbuffer = server.setup_shared_arrays()
-    if server.write_video.value:
+    server.cap = trackutils.Capture(
+                        server.open_vid(),
+                        grayscale=server.grayscale,
+                        raw_shape=server.rawshape,
+                        opener=server.open_vid\
+                                if server.vid_source_type == "cam" else None
+                    )
+    ring = server.setup_shared_arrays()
+    server.notifier = sync.FrameNotifier(server.get_waiters_pattern(),
+                                            ring.header, mmg.HDR_WAITERS)
+    if server.write_video.value:# before any threads are started
         server.vidout = server.setup_vidout()
+    if server.writer_pool:# forked before any threads, too
+        videoout.get_writer_pool().start()
+    if server.threaded_capture:
+        server.capture = trackutils.ThreadedCapture(server.cap,
+                                server.frameshape,
+                                latest_only=server.vid_source_type == "cam",
+                                stride=server.frame_stride,
+                                retries=server.read_retries
+                            )
+        server.capture.start()
+    if server.recfilename is not None:
+        server.reclog = server.setup_reclog()
+        server.reclog.start()
 
     for func in server.atstart:
         server.atstart[func](server)
@@ -47,7 +64,7 @@ def _runforever(server):
     server.t_run_begin = time.time()
     while server.running.value and not server.timed_out():
         try:
-            server._eachframe(server.cap, databuffer, clockbuffer)
+            server._eachframe(server.cap, ring)
         except KeyboardInterrupt:
             server.running.value = False
             break
@@ -55,12 +72,33 @@ def _runforever(server):
             server.running.value = False
             break
 
-    if server.write_video.value:
+    if server.vidout is not None:# even if a cassette cleared write_video
         server.vidout.release()
+    if server.recfilename is not None:
+        server.reclog.close()
+        recordings.export_csv(server.recfilename)
 
     for func in server.atstop:
         server.atstop[func](server)
-
+    server.recorded_frames.clear() # frames never dumped, and their spill file
+    videoout.close_writer_pool() # clips dumped so far are written
+
+    if server.roi_radius is not None\
+            and not tracktorlive.SUPPRESS_INFORMATIVE_PRINT:
+        print(f"{server.feed_id}: windowed detection fell back to full-frame"
+                f" search on {server.roi_fallbacks.value} of"
+                f" {server.roi_frames.value} frames"
+                f" ({100*server.get_roi_fallback_rate():.1f}%).")
+    if server.vidqueue is not None and server.vidqueue.dropped > 0\
+            and not tracktorlive.SUPPRESS_INFORMATIVE_PRINT:
+        print(f"{server.feed_id}: video writer fell behind and dropped"
+                f" {server.vidqueue.dropped} of"
+                f" {server.vidqueue.dropped + server.vidqueue.put_count}"
+                " frames.")
+
+    server.notifier.close()
+    if server.capture is not None:
+        server.capture.stop()
     server.cap.release()
 
 
@@ -75,41 +113,181 @@ class TracktorServer:
                     vidinput,
                     params,
                     n_ind,
+                    background=None,
+                    background_every=1,
                     buffer_size=10,#seconds
+                    detection_backend="contours",
                     draw=False,
+                    drop_video_frames=None,
                     feed_id=None,
+                    frame_stride=1,
+                    grayscale=False,
                     keep_recordings=False,
                     keep_video=False,
-                    port_num=281197,
+                    keep_video_budget=videoout.CLIP_BUDGET,
+                    port_num=None,
+                    preprocess=None,
                     realtime=True,
+                    roi_radius=None,
+                    scaling=1.0,
+                    share_frames=0,
+                    threaded_capture=None,
                     timeout=None,
                     use_kmeans=True,
                     write_recordings=False,
                     write_video=False,
+                    writer_pool=None,
                     width=640,
                     height=480
                 ):
         """
         Initializes the tracking server with video input, tracking parameters, and optional flags 
         for recording and visualization.
+
+        background (str) replaces adaptive thresholding with a background
+        model, learnt incrementally while tracking: objects are whatever
+        differs from the background. "running" keeps a per-pixel running mean
+        and variance, "median" a streaming approximate median, and "mog2" and
+        "knn" use OpenCV's background subtractors. For "running" and
+        "median", params["offset"] is the smallest difference in grey level
+        that counts as foreground. None (default) uses adaptive thresholding.
+        Cannot be combined with roi_radius.
+
+        background_every (int) makes the background model learn from only one
+        frame in this many, saving time on slowly changing scenes.
+
+        detection_backend (str) is how objects are found in the thresholded
+        frame: "contours" (default, as in the original tracktor) or
+        "components", which uses connected-component statistics and is much
+        faster on noisy frames. The latter measures areas in pixels, which are
+        slightly larger than contour areas.
+
+        frame_stride (int) tracks only every frame_stride-th frame of a video
+        file, for quick passes over long recordings. Frames in between are
+        skipped without being decoded. Clock values stay in seconds of
+        video, buffers hold buffer_size seconds of tracked frames, videos
+        are written at fps/frame_stride so that they play in real time, and
+        roi_radius is scaled by frame_stride, as individuals move further
+        between tracked frames.
+
+        grayscale (bool) reads, tracks and stores single-channel frames:
+        framesbuffer, shared and recorded frames, and written videos are all
+        grayscale, taking a third of the memory of colour frames. Cameras
+        are asked for raw frames, whose luminance plane is used as is where
+        the backend allows it (e.g. YUYV, see config); other sources are
+        converted once, as frames are read. Cassettes then get
+        (height, width) frames.
+
+        preprocess (list) is a chain of preprocessing steps (masks, crop,
+        channel selection, contrast and blur; see tracktorlive.preprocess)
+        applied to each frame before detection, in place of per-frame
+        cassettes doing the same. It is compiled once, and detection runs
+        only within the bounding box of the mask. Frames published and
+        recorded are not altered.
+
+        roi_radius (int) enables searching for individuals only in windows of
+        this half-width (in pixels) around their predicted positions, instead
+        of in the whole frame. Positions are predicted assuming constant
+        velocity. Whenever the windows do not yield exactly n_ind individuals,
+        or an individual extends beyond its window, the frame is searched in
+        full instead. None (default) always searches the full frame.
+
+        scaling (float) is the factor by which frames are downscaled before
+        detection, e.g. 0.5 to detect at half resolution. Tracking parameters
+        and all output coordinates stay in full-resolution pixels.
+
+        share_frames (int) is the number of most recent tracked frames made
+        available to clients through shared memory (0 disables frame sharing).
+
+        keep_video_budget (int) is how many bytes of frames recorded with
+        keep_video are held in memory. Longer recordings are spilled to a file
+        in the directory feed_id, from which dumpvideo writes the video.
+
+        writer_pool (bool) starts the processes that encode clips for
+        dumpvideo (see videoout.WriterPool) as the server starts, before it
+        starts any threads; forking them later, from a process with running
+        threads, can deadlock. Defaults to the value of keep_video. Set it if
+        cassettes turn keep_video on while tracking. Otherwise the pool is
+        started on the first dumpvideo.
+
+        write_recordings (bool) writes tracks to a binary log in the
+        directory feed_id while tracking (see recordings.TrackLog), which is
+        exported to a CSV file next to it when the server stops cleanly. A
+        run that crashes or is killed leaves only the log, with every record
+        written up to about a second before; export it by hand with
+        tracktorlive.recordings.export_csv(logfile).
+
+        port_num is deprecated and ignored: clients now attach to the server
+        through shared memory alone, and no port is opened.
+
+        drop_video_frames (bool) decides what happens when write_video is set
+        and the video writer, which encodes frames in a separate process,
+        falls behind by more than a few frames: if True, frames are left out
+        of the video; if False, tracking waits for the writer. Defaults to
+        the value of realtime. See get_video_queue.
+
+        threaded_capture (bool) decodes frames in a background thread, so that
+        decoding overlaps with tracking. Files are decoded a few frames ahead;
+        cameras keep only the newest frame and drop stale ones, so that the
+        tracked frame is always the freshest. Defaults to the value of
+        realtime. The number of frames dropped before each sample is published
+        alongside the clock (see get_skipped).
         """
 
+        if port_num is not None:
+            warnings.warn("port_num is no longer used and will be removed",
+                            DeprecationWarning, stacklevel=2)
         if not feed_id:
             self.feed_id = str(ulid.ULID())
         else:
             self.feed_id = feed_id
+        self.background = background
+        self.background_every = background_every
         self.buffer_size = buffer_size
+        self.detection_backend = detection_backend
         self.keep_recordings = mp.Value('b', keep_recordings)
         self.keep_video = mp.Value('b', keep_video)
+        self.keep_video_budget = keep_video_budget
+        if writer_pool is None:
+            writer_pool = keep_video
+        self.writer_pool = writer_pool
         self.n_ind = n_ind
+        self.frame_stride = int(frame_stride)
+        if self.frame_stride < 1:
+            raise ValueError("frame_stride must be a positive integer")
+        if realtime and self.frame_stride > 1:
+            raise ValueError("frame_stride works only on video files"
+                                " (realtime=False)")
+        if "fps" in params\
+                and int(params["fps"]/self.frame_stride*buffer_size) < 1:
+            raise ValueError("frame_stride leaves no tracked frame within"
+                                " buffer_size seconds; lower frame_stride or"
+                                " raise buffer_size")
+        self.grayscale = grayscale
         self.params = params
-        self.port_num = port_num
+        self.preprocess = preprocess
         self.use_kmeans = use_kmeans
+        self.splitter = splitting.BlobSplitter(n_ind) if use_kmeans else None
         self.vidinput = vidinput
         self.write_recordings = mp.Value('b', write_recordings)
         self.write_video = mp.Value('b', write_video)
         self.width = width
         self.height = height
+        self.roi_radius = roi_radius
+        self.roi_frames = mp.Value('i', 0)
+        self.roi_fallbacks = mp.Value('i', 0)
+        self.meas_prev = None
+        self.scaling = scaling
+        self.share_frames = share_frames
+        if threaded_capture is None:
+            threaded_capture = realtime
+        self.threaded_capture = threaded_capture
+        if drop_video_frames is None:
+            drop_video_frames = realtime
+        self.drop_video_frames = drop_video_frames
+        self.capture = None
+        self.skipped = 0
+        self.frame_msec = None # backend timestamp of current_frame, if any
 
         if timeout is None:
             self.timeout = np.inf
@@ -117,59 +295,72 @@ class TracktorServer:
             self.timeout = timeout
         self.draw = draw
 
-        sync.wait_for_server((ADDR, port_num))
-        self.manager = SyncManager(address=(ADDR, port_num), authkey=b'secret')
-        self.manager.connect()
-        self.semaphore = self.manager.get_semaphore(self.feed_id)
-
-        self.port_num = port_num
         self.serverproc = None
 
         if "fps" in params:
             self.fps = params["fps"]
+            self.sample_fps = self.fps/self.frame_stride # tracked frames/s
+
+        cap_temp = trackutils.get_vid(self.vidinput, self.grayscale)
+        cap_temp.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        cap_temp.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        _, frame = cap_temp.read()
+        self.rawshape = frame.shape # as decoded, e.g. packed YUYV
+        if self.grayscale:
+            self.framesize = trackutils.frame_size(cap_temp, frame)
+            self.frameshape = self.framesize[::-1]
+        else:
+            self.framesize = (int(frame.shape[1]*1.0),
+                                int(frame.shape[0]*1.0))
+            self.frameshape = frame.shape
+        cap_temp.release()
+
+        if background is not None and roi_radius is not None:
+            raise ValueError("background and roi_radius cannot be combined")
+        self.detector = trackutils.Detector(self.frameshape,
+                                            scaling=self.scaling,
+                                            backend=self.detection_backend,
+                                            background=self.background,
+                                            background_every=self.background_every,
+                                            preprocess=self.preprocess,
+                                            **self.params)
 
         self.datashm, self.clockshm = self.setup_shared_mems()
-        self.databuffer, self.clockbuffer = self.setup_shared_arrays()
+        self.ring = self.setup_shared_arrays()
+        self.frameshm, self.framering = self.setup_shared_frames()
+        self.vidqueueshm, self.vidqueue = self.setup_video_queue()
+        self.vidout = None
 
-        self.resmanager = mp.Manager()
-        self.framesbuffer = [None for i in range(int(self.fps * self.buffer_size))]
+        self.framesbuffer = mmg.FrameHistory(int(self.sample_fps * self.buffer_size),
+                                                self.frameshape)
         self.vid_source_type = "cam"
         if not realtime:
             self.vid_source_type = "file"
+        # cameras may fail to deliver a frame for a moment; files just end
+        self.read_retries = trackutils.CAMERA_RETRIES\
+                                if self.vid_source_type == "cam" else 0
 
         self.create_feed_file()
         self.atstart = {}
         self.casettes = {}
         self.atstop = {}
 
-        self.meas_last = [[0, 0] for j in range(self.n_ind)]
-        self.meas_now = [[0, 0] for j in range(self.n_ind)]
-#        self.meas_last = self.resmanager.list(self.meas_last)
-#        self.meas_now = self.resmanager.list(self.meas_now)
+        # no positions are known until individuals are first found
+        self.meas_last = []
+        self.meas_now = []
 
-        self.recorded_frames = []
-        self.recorded_points = []
-        self.recorded_times  = []
-        cap_temp = cv2.VideoCapture(self.vidinput)
-        cap_temp.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
-        cap_temp.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
-        _, frame = cap_temp.read()
-        self.framesize = (int(frame.shape[1]*1.0),
-                            int(frame.shape[0]*1.0))
+        self.recorded_frames = videoout.ClipRecorder(self.keep_video_budget,
+                                                        spill_dir=self.feed_id)
+        self.recording = recordings.Recording(self.n_ind)
 
         if self.write_video.value:
             os.makedirs(self.feed_id, exist_ok=True)
-        cap_temp.release()
 
+        self.recfilename = None
         if self.write_recordings.value:
             os.makedirs(self.feed_id, exist_ok=True)
-            fname = str(ulid.ULID())+'.csv'
-            fname = joinpath(self.feed_id, fname)
-            self.recout = open(fname, 'w')
-            cols = ['time']
-            for i in range(self.n_ind):
-                cols.extend([f"x{i}", f"y{i}"])
-            print(",".join(cols), file=self.recout,flush=True)
+            self.recfilename = joinpath(self.feed_id,
+                                str(ulid.ULID()) + recordings.EXTENSION)
 
     def __str__(self):
         return f"{self.__class__.__name__} object feed_id:{self.feed_id}"
@@ -205,11 +396,15 @@ class TracktorServer:
         feeddata = {
             "feed_id":      self.feed_id,
             "fps":          self.fps,
+            "frame_stride": self.frame_stride,
             "buffer_size":  self.buffer_size,
             "n_ind":        self.n_ind,
             "datashm":      self.datashm.name,
             "clockshm":     self.clockshm.name,
-            "port_num":      self.port_num,
+            "ring_length":  self.ring.length,
+            "frameshm":     self.frameshm.name if self.frameshm else None,
+            "frame_slots":  self.share_frames,
+            "frame_shape":  self.frameshape,
             "vid_source":   self.vid_source_type,
             "params":       self.params
             }
@@ -220,63 +415,134 @@ class TracktorServer:
 
     def setup_shared_mems(self):
         """Allocates shared memory blocks for tracking and timing data."""
-        floatsize = np.dtype(np.float64).itemsize
-        trackingdatashape = (self.n_ind, 2, int(self.fps*self.buffer_size))
-        timedatashape = (int(self.fps*self.buffer_size), )
-        trackingdatasize = np.prod(trackingdatashape)* floatsize #size in bytes of 1st shm
-        timedatasize = np.prod(timedatashape)*floatsize # size of 2nd shm
+        datasize, clocksize = mmg.trackring_sizes(self.n_ind,
+                                    int(self.sample_fps*self.buffer_size))
 
-        datashm = mmg.create_shared_data(trackingdatasize)
-        clockshm = mmg.create_shared_data(timedatasize)
+        datashm = mmg.create_shared_data(datasize)
+        clockshm = mmg.create_shared_data(clocksize)
 
         return datashm, clockshm
 
     def setup_shared_arrays(self):
-        """Wraps shared memory buffers in NumPy arrays and initializes them to NaN."""
-        trackingdatashape = (self.n_ind, 2, int(self.fps*self.buffer_size))
-        timedatashape = (int(self.fps*self.buffer_size), )
-        databuffer = np.ndarray(trackingdatashape,
-                           dtype=np.float64,
-                           buffer=self.datashm.buf
-                       )
-        clockbuffer = np.ndarray(timedatashape,
-                           dtype=np.float64,
-                           buffer=self.clockshm.buf
-                       )
-
-        databuffer[:,:,:] = np.nan
-        clockbuffer[:] = np.nan
-
-        return databuffer, clockbuffer
+        """Wraps shared memory buffers in a ring buffer and initializes them to NaN."""
+        ring = mmg.TrackRing(self.datashm, self.clockshm,
+                                self.n_ind, int(self.sample_fps*self.buffer_size))
+        ring.reset()
+        self.ring = ring
+
+        return ring
+
+    def setup_shared_frames(self):
+        """
+        Allocates the shared memory frame ring, if frames are to be shared.
+        """
+        if self.share_frames <= 0:
+            return None, None
+
+        frameshm = mmg.create_shared_data(
+                    mmg.framering_size(self.share_frames, self.frameshape)
+                    )
+        framering = mmg.FrameRing(frameshm, self.share_frames, self.frameshape)
+        framering.reset()
+        return frameshm, framering
+
+    def setup_video_queue(self):
+        """
+        Allocates the shared memory queue of frames for the video writer, if
+        video is to be written.
+        """
+        if not self.write_video.value:
+            return None, None
+
+        vidqueueshm = mmg.create_shared_data(
+                    mmg.framequeue_size(videoout.WRITER_SLOTS, self.frameshape)
+                    )
+        vidqueue = mmg.FrameQueue(vidqueueshm, videoout.WRITER_SLOTS,
+                                    self.frameshape)
+        vidqueue.reset()
+        return vidqueueshm, vidqueue
 
     def setup_vidout(self):
         """
-        Does a parallelisation-proof vidout setup.
+        Starts the video writer process, which takes frames from the queue
+        set up by setup_video_queue().
         """
 
-        fourcc = cv2.VideoWriter_fourcc(*TracktorServer._codec)
         self.vidfilename=joinpath(self.feed_id,
                                 str(ulid.ULID()) + "." + config.settings['file_format'])
-        vidout = cv2.VideoWriter(
-                                filename=self.vidfilename,
-                                fourcc = fourcc,
-                                fps = self.params['fps'],
-                                frameSize = self.framesize,
-                                isColor = True
+        vidout = videoout.VideoWriterProcess(
+                                self.vidfilename,
+                                fps = self.sample_fps,
+                                framesize = self.framesize,
+                                codec = TracktorServer._codec,
+                                shape = self.frameshape,
+                                drop = self.drop_video_frames,
+                                shm = self.vidqueueshm
                             )
-        assert vidout.isOpened()
+        vidout.start()
         return vidout
 
+    def setup_reclog(self):
+        """
+        Opens the binary track log written while write_recordings is set (see
+        recordings.TrackLog); it is exported to CSV when tracking ends
+        cleanly.
+        """
+        return recordings.TrackLog(self.recfilename, self.n_ind,
+                                    metadata=self.recording_metadata())
+
+    def recording_metadata(self):
+        """Returns information about this feed stored with recorded tracks."""
+        return {
+            "feed_id":      self.feed_id,
+            "fps":          self.fps,
+            "frame_stride": self.frame_stride,
+            "vid_source":   self.vid_source_type,
+            "vidinput":     str(self.vidinput),
+            "params":       self.params
+            }
+
+    @property
+    def recorded_points(self):
+        """(n, n_ind, 2) array of positions kept since keep_recordings was set."""
+        return self.recording.points
+
+    @property
+    def recorded_times(self):
+        """(n,) array of clock values of recorded_points."""
+        return self.recording.clock
+
+    def open_vid(self):
+        """
+        Opens the video source, set up for tracking (see Capture's opener).
+        """
+        cap = trackutils.get_vid(self.vidinput, self.grayscale)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if self.vid_source_type == "cam":
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1) # don't queue stale frames
+        return cap
+
     def get_data_and_clock(self):
         """
-        Returns a copy of the current data and clock buffers, with thread-safe access.
+        Returns a copy of the current data and clock buffers in chronological
+        order. Reads are lock-free (see memorymanagement.TrackRing).
         """
-        self.semaphore.acquire()
-        data = self.databuffer.copy()
-        clock = self.clockbuffer.copy()
-        self.semaphore.release()
+        return self.ring.ordered()
 
-        return data, clock
+    def get_window(self, n):
+        """
+        Returns a copy of only the newest n samples of data and clock, in
+        chronological order.
+        """
+        return self.ring.window(n)
+
+    def get_skipped(self, n):
+        """
+        Returns, for the newest n samples, how many camera frames were dropped
+        right before each (always 0 unless capturing in a thread).
+        """
+        return self.ring.skipped_window(n)
 
     def get_clients(self):
         """Returns a list of client files currently connected to this feed."""
@@ -286,33 +552,42 @@ class TracktorServer:
                         )
                 )
 
-    def _eachframe(self, cap, databuffer, clockbuffer):#tracking happens here
+    def get_waiters_pattern(self):
+        """Returns a glob pattern matching new-frame pipes of this feed's clients."""
+        return joinpath(tracktorlive.CLIENTS_DIR, f"tlwake-{self.feed_id}-*")
+
+    def _eachframe(self, cap, ring):#tracking happens here
         """
         Processes a single frame: tracking, updating shared buffers, and optionally
         recording or drawing.
         """
         try:
-            self.current_frame, self.frame_index = trackutils.get_frame(cap)
+            if self.capture is not None:
+                self.current_frame, self.frame_index,\
+                    self.t_capture, self.skipped, self.frame_msec =\
+                        self.capture.read(timeout=CAPTURE_TIMEOUT)
+            else:
+                cap.skip(self.frame_stride - 1) # skipped without decoding
+                self.current_frame, self.frame_index = cap.read(
+                                                self.framesbuffer.next_slot(),
+                                                retries=self.read_retries)
+                self.t_capture = time.time()
+                self.frame_msec = cap.msec
+        except TimeoutError:# no frame yet, check for stops and try again
+            return None
         except trackutils.VideoEndedError as e:
-            if self.vid_source_type == "file":
-                # file completed
-                self.running.value = False
-                return None
-            print(f"encountered inexplicable EOFERROR: {e}")
-            pass
+            # file completed, or camera lost even after retrying
+            if self.vid_source_type == "cam":
+                print(f"{self.feed_id}: camera stopped delivering frames"
+                        f" ({e}), stopping.")
+            self.running.value = False
+            return None
 
         for func in self.casettes:
             self.casettes[func](self)
 
-        self.current_frame, contours,\
-            self.meas_last, self.meas_now = trackutils.get_contours(
-                                            frame=self.current_frame,
-                                            meas_last=self.meas_last,
-                                            meas_now=self.meas_now,
-                                            scaling=1.0,#FIXME
-                                            draw_contours=self.draw,
-                                            **self.params
-                                        )
+        meas_prev = self.meas_now[:] # positions in the previous frame
+        self.current_frame, contours = self._detect()
 
         self.current_frame, self.meas_now = trackutils.cleanup_centroids(
                                     self.current_frame,
@@ -323,65 +598,150 @@ class TracktorServer:
                                     mot=self.n_ind>1,
                                     frame_index=self.frame_index,
                                     draw_circles=self.draw,
-                                    use_kmeans=self.use_kmeans
+                                    use_kmeans=self.use_kmeans,
+                                    splitter=self.splitter
                                 )
 
-        self.semaphore.acquire()
-
-        databuffer[:,:,:-1] = databuffer[:,:,1:]
-        clockbuffer[:-1] = clockbuffer[1:]
-
         if self.vid_source_type == "cam":
-            clockbuffer[-1] = time.time() - self.t_init
+            t = self.t_capture - self.t_init
         else:
-            clockbuffer[-1] = self.frame_index/self.fps
+            t = self.frame_index/self.fps
 
-        databuffer[:,:,-1] = -1.0
-        if len(self.meas_now) > 0:
-            databuffer[:len(self.meas_now[:self.n_ind]),:,-1] =\
-                        self.meas_now[:self.n_ind]
-        self.framesbuffer[:-1] = self.framesbuffer[1:]
-        self.framesbuffer[-1] = self.current_frame.copy()
+        self.framesbuffer.publish(self.current_frame)
+        self.current_frame = self.framesbuffer[-1]
+        if self.framering is not None:
+            np.copyto(self.framering.next_slot(), self.current_frame)
+            self.framering.publish()
+        ring.push(self.meas_now, t, self.skipped)
+        self.meas_prev = meas_prev
+        self.notifier.notify()
 
         if self.keep_video.value:
-            if len(self.recorded_frames) == 0:
-                self.recorded_frames.extend(
-                    [fr for fr in self.framesbuffer if fr is not None]
-                    )
+            if len(self.recorded_frames) == 0:# starts with the frame history
+                self.recorded_frames.extend(self.framesbuffer)
             else:
                 self.recorded_frames.append(self.current_frame)
 
         if self.keep_recordings.value:
-            if len(self.recorded_points) == 0:
-                self.recorded_points.extend(list(self.databuffer))
-                self.recorded_times.extend(list(self.clockbuffer))
+            if len(self.recording) == 0:
+                data, clock = ring.ordered()
+                valid = ~np.isnan(clock)
+                self.recording.extend(np.moveaxis(data[:,:,valid], -1, 0),
+                                        clock[valid])
+                self.recording.frame[-1] = self.frame_index
             else:
-                self.recorded_points.append(self.databuffer[:,:,-1])
-                self.recorded_times.append(self.clockbuffer[-1])
+                points, t = ring.latest()
+                self.recording.append(points, t, self.frame_index)
 
 
-        if self.write_video.value:
+        if self.write_video.value and self.vidout is not None:
             self.vidout.write(self.current_frame)
 
-        if self.write_recordings.value:
-            entry=[clockbuffer[-1]]
-            entry.extend(list(databuffer.copy()[:,:,-1].reshape(2*self.n_ind)))
-            entry=[str(x) for x in entry]
-            print(",".join(entry), file=self.recout, flush=True)
-        self.semaphore.release()
+        if self.write_recordings.value and self.recfilename is not None:
+            points, t = ring.latest()
+            self.reclog.append(points, t, self.frame_index)
+
+    def _detect(self):
+        """
+        Finds individuals in the current frame, within predicted windows if
+        roi_radius is set, else (or if that fails) in the whole frame.
+        """
+        if self.roi_radius is not None:
+            centres = trackutils.predict_positions(self.meas_now,
+                                                    self.meas_prev,
+                                                    self.n_ind)
+            if centres is not None:
+                self.roi_frames.value += 1
+                # pad so that blurring and thresholding within the radius
+                # see the same neighbourhood as on the full frame
+                pad = self.params["block_size"]//2 + 3
+                windows = trackutils.roi_windows(centres,
+                                                self.roi_radius*self.frame_stride,
+                                                self.current_frame.shape, pad)
+                final, contours, meas_last, meas_now, complete =\
+                    self.detector.detect_windows(
+                                        self.current_frame,
+                                        windows,
+                                        meas_last=self.meas_last,
+                                        meas_now=self.meas_now,
+                                        draw_contours=self.draw
+                                    )
+                if complete and len(meas_now) == self.n_ind:
+                    self.meas_last, self.meas_now = meas_last, meas_now
+                    return final, contours
+                self.roi_fallbacks.value += 1
+                self.meas_now[:] = meas_last # undo, search the full frame
+
+        final, contours,\
+            self.meas_last, self.meas_now = self.detector.detect(
+                                            self.current_frame,
+                                            meas_last=self.meas_last,
+                                            meas_now=self.meas_now,
+                                            draw_contours=self.draw
+                                        )
+        return final, contours
+
+    def get_roi_fallback_rate(self):
+        """
+        Returns the fraction of frames for which windowed detection (see
+        roi_radius) failed and the full frame had to be searched.
+        """
+        if self.roi_frames.value == 0:
+            return 0.0
+        return self.roi_fallbacks.value/self.roi_frames.value
+
+    def get_video_queue(self):
+        """
+        Returns (queued, dropped): how many frames are waiting for the video
+        writer (see write_video), and how many it had no room for (see
+        drop_video_frames). Both are 0 if no video is written.
+        """
+        if self.vidqueue is None:
+            return 0, 0
+        return self.vidqueue.depth, self.vidqueue.dropped
+
+    def get_background(self):
+        """
+        Returns the current background estimate of the background model (see
+        background), at the detection resolution, or None if there is none.
+        Only available in the server process, e.g. to stop cassettes.
+        """
+        return self.detector.background_image()
 
     def dumpvideo(self, outfile=None, codec=_codec):
-        """Writes recorded video frames to file, if recording was enabled."""
+        """
+        Writes recorded video frames to file in the background, if recording
+        was enabled, and forgets them. Frames spilled to disk (see
+        keep_video_budget) are encoded from there.
+
+        Returns:
+            concurrent.futures.Future, done once the file is written (see
+            videoout.WriterPool), or None if outfile is None.
+        """
+        job = None
         if outfile is not None:
-            self.semaphore.acquire()
-            frcopy = self.recorded_frames.copy()
-            self.semaphore.release()
+            job = self.recorded_frames.dump(outfile, self.sample_fps,
+                                            self.framesize, codec)
+        else:
+            self.recorded_frames.clear()
+        return job
 
-            videoout.prl_vidout(frcopy, outfile, self.fps, self.framesize, codec)
+    def dumpdata(self, outfile=None):
+        """
+        Writes tracks recorded with keep_recordings to outfile, a session
+        file (see recordings.Recording.save, and recordings.read_session to
+        read it back), and forgets them.
 
-        self.recorded_frames = []
+        Returns:
+            path of the file written, or None if outfile is None.
+        """
+        written = None
+        if outfile is not None:
+            written = self.recording.save(outfile,
+                                            metadata=self.recording_metadata())
 
-#    def dumpdata(self, outfile=None):#FIXME
+        self.recording.clear()
+        return written
 
     def run(self):
         """Starts the server in a background process and begins tracking."""
@@ -400,31 +760,37 @@ class TracktorServer:
         #self.serverproc.terminate()
         self.serverproc.join()
         self.serverproc.close()
-        self.databuffer[:,:,1:] = self.databuffer[:,:,:-1]
-        self.clockbuffer[1:] = self.clockbuffer[:-1]
-
-        self.databuffer[:,:,-1] = -1.0
-        self.clockbuffer[-1] = -1.0
+        self.ring.push([], -1.0) # end-of-feed marker for clients
+        notifier = sync.FrameNotifier(self.get_waiters_pattern(),
+                                        self.ring.header, mmg.HDR_WAITERS)
+        notifier.notify()
+        notifier.close()
 #        if self.write_video.value:
 #            self.vidout.release()
-        if self.write_recordings.value:
-            self.recout.close()
 
     def __del__(self):
         """
         Final cleanup of feed metadata and shared memory when the server object is
         deleted.
         """
+        if not hasattr(self, "datashm"):# __init__ failed before setting up
+            return
         os.remove(self.get_feed_filename())
         if self.running.value:
             self.stop()
             time.sleep(0.001)
+        shms = [self.datashm, self.clockshm]
+        if self.frameshm is not None:
+            shms.append(self.frameshm)
+        if self.vidqueueshm is not None:
+            del self.vidqueue # its arrays must go before the segment
+            shms.append(self.vidqueueshm)
         try:
-            self.datashm.close()
-            self.clockshm.close()
+            for shm in shms:
+                shm.close()
         except (FileNotFoundError, KeyError):
             pass
-        for shm in (self.datashm, self.clockshm):
+        for shm in shms:
             try:
                 shm.unlink()
             except (FileNotFoundError, KeyError):
@@ -437,7 +803,7 @@ class TracktorServer:
 
 def spawn_trserver(vidinput, params, n_ind=1, **kwargs):
     """
-    Creates and returns a new TracktorServer and its semaphore manager.
+    Creates and returns a new TracktorServer.
 
     Args:
         vidinput (str or int): Path to video file or camera index.
@@ -446,36 +812,30 @@ def spawn_trserver(vidinput, params, n_ind=1, **kwargs):
         **kwargs: Additional arguments passed to TracktorServer.
 
     Returns:
-        tuple: (TracktorServer instance, multiprocessing.Process managing the semaphore)
-
-    Raises:
-        ValueError: If the port number is already in use (via `sync.prl_sem_server`).
+        tuple: (TracktorServer instance, None). The second element used to be
+        the semaphore manager process; shared data is now read lock-free, so
+        no such process exists. It is kept so that existing scripts unpacking
+        `server, semm` keep working.
     """
 
-    port_num = random.choice(range(12000, 20000))
-    semm = sync.prl_sem_server(port_num)
     server = TracktorServer(
                     vidinput=vidinput,
                     params=params,
                     n_ind=n_ind,
-                    port_num=port_num,
                     **kwargs
                 )
-    return server, semm
+    return server, None
 
-def close_trserver(server, semm):
+def close_trserver(server, semm=None):
     """
-    Stops the server and terminates the semaphore manager process.
+    Stops the server.
 
     Args:
         server (TracktorServer): The server instance to stop.
-        semm (multiprocessing.Process): The semaphore manager process.
+        semm: Unused, kept for backward compatibility (see spawn_trserver).
 
     Returns:
         None
-
-    Raises:
-        RuntimeError: If stopping the server or joining the semaphore fails.
     """
 
     try:
@@ -483,17 +843,14 @@ def close_trserver(server, semm):
     except (FileNotFoundError, KeyError) as e:
         print(f"[WARN]: an SHM closing issue occured: {e}, but safe to ignore (?)")
         print("Run 'tracktorlive clear' to be safe.")
-    semm.terminate()
-    semm.join()
-    semm.close()
 
-def run_trserver(server, semm):
+def run_trserver(server, semm=None):
     """
     Starts the server process for tracking.
 
     Args:
         server (TracktorServer): The server instance to run.
-        semm (process): semaphore manager process
+        semm: Unused, kept for backward compatibility (see spawn_trserver).
 
     Returns:
         None
@@ -501,14 +858,14 @@ def run_trserver(server, semm):
 
     server.run()
 
-def wait_and_close_trserver(server, semm):
+def wait_and_close_trserver(server, semm=None):
     """
     Blocks until the server times out or is manually interrupted, then closes the
     server.
 
     Args:
         server (TracktorServer): The server instance.
-        semm (multiprocessing.Process): The semaphore manager process.
+        semm: Unused, kept for backward compatibility (see spawn_trserver).
 
     Returns:
         None
@@ -524,16 +881,16 @@ def wait_and_close_trserver(server, semm):
     except KeyboardInterrupt:
         print(f"Terminating server: {server.feed_id}")
     finally:
-        close_trserver(server, semm)
+        close_trserver(server)
 
-def run_trsession(server, semm, clients=None):
+def run_trsession(server, semm=None, clients=None):
     """
     Runs a TracktorServer and one or more TracktorClients concurrently, and
     stops all processes cleanly on completion or interruption.
 
     Args:
         server (TracktorServer): The tracking server instance.
-        semm (multiprocessing.Process): The semaphore manager.
+        semm: Unused, kept for backward compatibility (see spawn_trserver).
         clients (TracktorClient or list[TracktorClient], optional): One or more clients
         connected to the server.
 
@@ -550,7 +907,7 @@ def run_trsession(server, semm, clients=None):
         clients = [clients]
     try:
         # Start server and all clients
-        run_trserver(server, semm)
+        run_trserver(server)
         for cl in clients:
             client.run_trclient(cl)
 
@@ -569,5 +926,5 @@ def run_trsession(server, semm, clients=None):
             except Exception as e:
                 print(f"Error stopping client: {e}")
 
-        # Stop server and semaphore
-        close_trserver(server, semm)
+        # Stop server
+        close_trserver(server)
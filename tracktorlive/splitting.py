@@ -0,0 +1,199 @@
+# Pranav Minasandra
+# 18 Oct 2026
+# pminasandra.github.io
+
+"""
+Separation of individuals whose blobs have merged, e.g. when animals touch.
+"""
+
+import collections
+
+import cv2
+import numpy as np
+
+from . import tracktor as tr
+
+AREA_HISTORY = 500 # number of single-animal blob areas remembered
+MAX_POINTS = 256 # pixels per blob used for clustering
+MAX_ITER = 20
+
+def lloyd_kmeans(points, centres, weights=None, max_iter=MAX_ITER, tol=0.25):
+    """
+    Clusters points with Lloyd's algorithm, from given initial centres.
+
+    Args:
+        points (np.ndarray): (m, 2) array of points.
+        centres (np.ndarray): (k, 2) array of initial cluster centres.
+        weights (np.ndarray, optional): (m,) array of weights of points.
+        max_iter (int): maximum number of iterations.
+        tol (float): stop once no centre moves more than this.
+
+    Returns:
+        (k, 2) array of cluster centres. Centres that attract no points stay
+        where they were.
+    """
+    centres = np.array(centres, dtype=float)
+    if weights is None:
+        weights = np.ones(len(points))
+    k = len(centres)
+    for _ in range(max_iter):
+        dists = ((points[:, None, :] - centres[None, :, :])**2).sum(axis=-1)
+        labels = dists.argmin(axis=1)
+        counts = np.bincount(labels, weights=weights, minlength=k)
+        sums = np.zeros_like(centres)
+        np.add.at(sums, labels, points*weights[:, None])
+        moved = counts > 0
+        new = centres.copy()
+        new[moved] = sums[moved]/counts[moved, None]
+        shift = np.abs(new - centres).max()
+        centres = new
+        if shift <= tol:
+            break
+    return centres
+
+def contour_areas(contours):
+    """Returns the area of each contour (or blob) in pixels."""
+    if isinstance(contours, tr.BlobContours):
+        return contours.areas
+    return np.array([cv2.contourArea(c) for c in contours])
+
+def blob_pixels(contours, i):
+    """Returns an (m, 2) array of (x, y) coordinates of pixels of blob i."""
+    if isinstance(contours, tr.BlobContours):
+        return contours.pixels(i)
+    contour = contours[i]
+    x, y, w, h = cv2.boundingRect(contour)
+    mask = np.zeros((h, w), dtype=np.uint8)
+    cv2.drawContours(mask, [contour], -1, 1, -1, offset=(-x, -y))
+    ys, xs = np.nonzero(mask)
+    return np.column_stack((xs + x, ys + y)).astype(float)
+
+def initial_centres(points, k, meas_last):
+    """
+    Chooses k starting centres for splitting one blob: the previous positions
+    of individuals closest to the blob, if there are enough of them, or else
+    points spread evenly along the long axis of the blob.
+    """
+    if meas_last is not None and len(meas_last) >= k:
+        last = np.asarray(meas_last, dtype=float)
+        dists = np.linalg.norm(last - points.mean(axis=0), axis=1)
+        centres = last[np.argsort(dists)[:k]]
+        gaps = np.linalg.norm(centres[:, None] - centres[None, :], axis=-1)
+        if gaps[np.triu_indices(k, 1)].min() >= 1.0:# else two would coincide
+            return centres
+
+    centred = points - points.mean(axis=0)
+    _, _, axes = np.linalg.svd(centred, full_matrices=False)
+    proj = centred @ axes[0]
+    order = np.argsort(proj)
+    picks = order[((np.arange(k) + 0.5)*len(order)/k).astype(int)]
+    return points[picks]
+
+class BlobSplitter:
+    """
+    Splits blobs too large to be a single individual into several, and
+    gathers fragments when there are more blobs than individuals.
+
+    The splitter remembers areas of blobs from frames in which exactly
+    n_inds individuals were found, and uses their median as the area of one
+    individual. A blob is split into as many parts as the number of such
+    areas it holds, and only its own pixels are clustered, starting from the
+    previous positions of the individuals near it.
+    """
+
+    def __init__(self, n_inds, history=AREA_HISTORY, max_points=MAX_POINTS):
+        """
+        Args:
+            n_inds (int): number of individuals being tracked.
+            history (int): number of single-animal areas to remember.
+            max_points (int): pixels of a blob used for clustering at most;
+                larger blobs are evenly subsampled.
+        """
+        self.n_inds = n_inds
+        self.areas = collections.deque(maxlen=history)
+        self.max_points = max_points
+
+    def single_area(self):
+        """Median area of a single individual, or None if unknown yet."""
+        if len(self.areas) == 0:
+            return None
+        return float(np.median(self.areas))
+
+    def observe(self, contours):
+        """Records blob areas from a frame in which everyone was found."""
+        self.areas.extend(contour_areas(contours))
+
+    def counts(self, areas):
+        """
+        Returns how many individuals each blob of given areas holds, at most
+        n_inds in total.
+        """
+        single = self.single_area()
+        if single is None:
+            # nothing known yet: everyone is in some blob, larger blobs first
+            counts = np.ones(len(areas), dtype=int)
+            for _ in range(self.n_inds - len(areas)):
+                counts[np.argmax(areas/counts)] += 1
+            return counts
+
+        counts = np.maximum(np.round(areas/single).astype(int), 1)
+        while counts.sum() > max(self.n_inds, len(areas)):
+            over = np.where(counts > 1, areas/counts, np.inf)
+            counts[np.argmin(over)] -= 1
+        return counts
+
+    def split(self, contours, meas_now, meas_last):
+        """
+        Replaces, in meas_now, the centroids of merged blobs with the
+        positions of the individuals within them.
+
+        Args:
+            contours (list or BlobContours): blobs found in the frame.
+            meas_now (list): centroid of each blob, updated in place.
+            meas_last (list): positions of individuals in the previous frame.
+
+        Returns:
+            contours, meas_now
+        """
+        areas = contour_areas(contours)
+        counts = self.counts(areas)
+        if np.all(counts == 1):
+            return contours, meas_now
+
+        found = []
+        for i, k in enumerate(counts):
+            if k == 1:
+                found.append(meas_now[i])
+                continue
+            points = blob_pixels(contours, i)
+            if len(points) > self.max_points:
+                points = points[::int(np.ceil(len(points)/self.max_points))]
+            if len(points) < k:
+                found.append(meas_now[i])
+                continue
+            centres = lloyd_kmeans(points, initial_centres(points, k, meas_last))
+            found.extend(centres.tolist())
+        meas_now[:] = found
+        return contours, meas_now
+
+    def merge(self, contours, meas_now, meas_last):
+        """
+        When there are more blobs than individuals, clusters blob centroids,
+        weighted by blob areas, into n_inds positions, starting from the
+        previous positions if all are known, else from the largest blobs.
+
+        Args:
+            see split().
+
+        Returns:
+            contours, meas_now
+        """
+        areas = contour_areas(contours)
+        points = np.asarray(meas_now, dtype=float)
+        if meas_last is not None and len(meas_last) == self.n_inds:
+            start = np.asarray(meas_last, dtype=float)
+        else:
+            start = points[np.argsort(areas)[::-1][:self.n_inds]]
+        centres = lloyd_kmeans(points, start, weights=np.maximum(areas, 1.0))
+        meas_now[:] = centres.tolist()
+        return contours, meas_now
@@ -3,56 +3,169 @@
 # pminasandra.github.io
 
 """
-Synchronisation and semaphore management
+Synchronisation between the server and its clients
 """
 
-import multiprocessing as mp
-from multiprocessing.managers import BaseManager
-import socket
+import glob
+import os
+import select
 import time
 
-_semaphores = {}
+class SeqLock:
+    """
+    Sequence lock over a counter stored in shared memory.
 
-ADDR='127.0.0.1'
-class SyncManager(BaseManager): pass
+    There is exactly one writer (the server). It increments the counter before
+    and after every update, so the counter is odd while an update is in
+    progress. Readers never block the writer: they note the counter, copy what
+    they need, and retry if the counter was odd or changed meanwhile.
 
-def _make_named_sem(name):
-    global _semaphores
-    if name not in _semaphores:
-        _semaphores[name] = mp.Semaphore(1)
-    return _semaphores[name]
+    Neither side issues memory barriers, as Python offers none. This is
+    correct only where the CPU keeps stores in order with stores and loads
+    with loads, as x86 (TSO) does, and relies on CPython running every
+    access to shared memory in program order. Weakly ordered CPUs, such as
+    the ARM of a Raspberry Pi, may make the counter visible before the data
+    it guards, so that a reader may, rarely, accept a sample torn by a
+    concurrent update. The counter itself is never torn: aligned int64
+    stores are atomic on both.
+    """
 
-SyncManager.register('get_semaphore', callable=_make_named_sem)
+    def __init__(self, header, index):
+        """
+        Args:
+            header (np.ndarray): int64 array in shared memory.
+            index (int): position of the sequence counter in header.
+        """
+        self.header = header
+        self.index = index
 
-def run_semaphore_server(port_num):
-    """
-    Makes the server willing to dispatch semaphores.
-    """
-    manager = SyncManager(address=(ADDR, port_num), authkey=b'secret')
-    s = manager.get_server()
-    try:
-        s.serve_forever()
-    except KeyboardInterrupt:
-        s.stop()
-
-def prl_sem_server(port_num):
+    def acquire_write(self):
+        """Marks the start of an update (writer only)."""
+        self.header[self.index] += 1
+
+    def release_write(self):
+        """Marks the end of an update (writer only)."""
+        self.header[self.index] += 1
+
+    def read(self, func, *args):
+        """
+        Calls func(*args) until it runs without a concurrent update, and
+        returns its result. func must only copy data out of shared memory.
+        """
+        while True:
+            start = self.header[self.index]
+            if start & 1:
+                time.sleep(0) # writer is mid-update; yield and retry
+                continue
+            result = func(*args)
+            if self.header[self.index] == start:
+                return result
+
+
+class FrameNotifier:
     """
-    Runs the semaphore manager in parallel
+    Server side of new-frame notifications. Every waiting client owns a named
+    pipe (see FrameWaiter); notify() writes one byte into each of them.
+
+    A client changes a counter in shared memory once its pipe exists, so
+    pipes are searched for only when that counter has changed since the
+    last search.
     """
-    serverproc = mp.Process(target=run_semaphore_server, args=(port_num,))
-    serverproc.start()
-    return serverproc
 
-def wait_for_server(address, timeout=5.0):
+    def __init__(self, pattern, header, index):
+        """
+        Args:
+            pattern (str): glob pattern matching the named pipes of clients.
+            header (np.ndarray): int64 array in shared memory.
+            index (int): position in header of the counter that clients
+                change when they start waiting.
+        """
+        self.pattern = pattern
+        self.header = header
+        self.index = index
+        self.fds = {}
+        self.registered = None # counter as of the last search
+
+    def rescan(self):
+        """Opens pipes of clients that attached since the last scan."""
+        # read before searching: clients registering during the search
+        # change the counter again, and are found by the next one
+        self.registered = int(self.header[self.index])
+        for path in glob.glob(self.pattern):
+            if path in self.fds:
+                continue
+            try:
+                self.fds[path] = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError:# client not listening yet, or already gone
+                pass
+
+    def notify(self):
+        """Wakes up all waiting clients."""
+        if self.header[self.index] != self.registered:
+            self.rescan()
+        for path, fd in list(self.fds.items()):
+            try:
+                os.write(fd, b"\0")
+            except BlockingIOError:# client has plenty of unread wakeups
+                pass
+            except OSError:# client went away
+                os.close(fd)
+                del self.fds[path]
+
+    def close(self):
+        """Closes all pipes."""
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds = {}
+
+
+class FrameWaiter:
     """
-    Wait until the semaphore manager comes online, with a timeout.
+    Client side of new-frame notifications, backed by a named pipe.
     """
-    host, port = address
-    deadline = time.time() + timeout
-    while time.time() < deadline:
+
+    def __init__(self, path, header, index):
+        """
+        Args:
+            path (str): where to create the named pipe.
+            header (np.ndarray): int64 array in shared memory.
+            index (int): position in header of the counter through which
+                FrameNotifier learns of new pipes.
+        """
+        self.path = path
+        os.mkfifo(path)
+        self.fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        # Holding a write end ourselves means the pipe never reports EOF when
+        # the server closes it, so select() below never spins.
+        self._keepalive = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        # Clients may race on this and lose an increment, but the counter
+        # still changes after every pipe has been made, which is all that
+        # FrameNotifier needs.
+        header[index] += 1
+
+    def wait(self, timeout):
+        """
+        Blocks until the server publishes a frame or timeout seconds pass.
+        Returns True if woken up by the server.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
         try:
-            with socket.create_connection((host, port), timeout=0.5):
-                return True
-        except (ConnectionRefusedError, socket.timeout):
-            time.sleep(0.1)
-    raise RuntimeError(f"Timeout: could not connect to manager at {address}")
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        """Closes and removes the named pipe."""
+        os.close(self.fd)
+        os.close(self._keepalive)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def can_wait_for_frames():
+    """Whether this platform supports FrameWaiter."""
+    return hasattr(os, "mkfifo")
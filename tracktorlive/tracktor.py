@@ -15,10 +15,15 @@ installation and use of the software is fully detailed in a user manual.
 See more: https://doi.org/10.1111/2041-210X.13166
 """
 
+import collections.abc
+
 #from cv2 import cv2#uncomment if you need to pylint
 import cv2#comment if you need to pylint
 import numpy as np
 from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
 from scipy.spatial.distance import cdist
 from sklearn.cluster import KMeans
 
@@ -66,6 +71,191 @@ def colour_to_thresh(frame, block_size = 31, offset = 25, blur=True,
                                 )
     return thresh
 
+BACKGROUND_RATE = 0.01 # default weight of each new frame in background models
+BACKGROUND_MODELS = ("running", "median", "mog2", "knn")
+
+def background_model(kind, min_diff=25, rate=BACKGROUND_RATE):
+    """
+    Creates a background model, whose apply() method returns the foreground
+    mask of a frame, to be used in place of colour_to_thresh.
+
+    Parameters
+    ----------
+    kind: str
+        "running" (RunningBackground), "median" (ApproxMedianBackground),
+        "mog2" or "knn" (OpenCV's background subtractors, see
+        SubtractorBackground).
+    min_diff: int(optional), default = 25
+        smallest difference in grey level from the background that counts as
+        foreground ("running" and "median" only)
+    rate: float(optional), default = BACKGROUND_RATE
+        weight given to each frame the model learns from
+
+    Returns
+    -------
+    model: one of the classes above
+    """
+    if kind == "running":
+        return RunningBackground(min_diff=min_diff, rate=rate)
+    if kind == "median":
+        return ApproxMedianBackground(min_diff=min_diff)
+    if kind == "mog2":
+        return SubtractorBackground(
+                    cv2.createBackgroundSubtractorMOG2(detectShadows=False),
+                    rate=rate)
+    if kind == "knn":
+        return SubtractorBackground(
+                    cv2.createBackgroundSubtractorKNN(detectShadows=False),
+                    rate=rate)
+    raise ValueError(f"unknown background model: {kind}")
+
+class RunningBackground:
+    """
+    Per-pixel running mean and variance of greyscale frames, updated with
+    exponential weights. A pixel is foreground when it differs from the mean
+    by more than n_sigma standard deviations, and by more than min_diff grey
+    levels. All work is done in preallocated float32 images.
+
+    The first frames are averaged with equal weights, so that the model
+    settles quickly; afterwards each frame gets the weight rate. The
+    variance learns only from background pixels, so that passing objects do
+    not make their paths look noisy, while the mean learns from every pixel:
+    objects that stay still for long (about 1/rate frames) fade into the
+    background.
+    """
+
+    colour = False # apply() takes greyscale frames
+
+    def __init__(self, min_diff=25, n_sigma=3.0, rate=BACKGROUND_RATE):
+        self.min_diff = float(min_diff)
+        self.n_sigma = float(n_sigma)
+        self.rate = rate
+        self.count = 0
+        self.mean = None
+
+    def _reset(self, gray):
+        shape = gray.shape
+        self.mean = gray.astype(np.float32)
+        self.var = np.full(shape, (self.min_diff/self.n_sigma)**2,
+                                dtype=np.float32)
+        self.diff = np.zeros(shape, dtype=np.float32)
+        self.sqdiff = np.zeros(shape, dtype=np.float32)
+        self.limit = np.zeros(shape, dtype=np.float32)
+        self.still = np.zeros(shape, dtype=np.uint8)
+        self.count = 0
+
+    def apply(self, gray, learn=True, dst=None):
+        """
+        Parameters
+        ----------
+        gray: ndarray, shape(n_rows, n_cols), uint8
+            greyscale frame; a frame of another shape restarts the model
+        learn: bool(optional), default = True
+            whether to update the model with this frame
+        dst: ndarray(optional)
+            uint8 image the mask is written into
+
+        Returns
+        -------
+        thresh: ndarray, shape(n_rows, n_cols) binarised(0,255) image
+        """
+        if self.mean is None or self.mean.shape != gray.shape:
+            self._reset(gray)
+
+        cv2.subtract(gray, self.mean, dst=self.diff, dtype=cv2.CV_32F)
+        cv2.multiply(self.diff, self.diff, dst=self.sqdiff)
+        np.multiply(self.var, self.n_sigma**2, out=self.limit)
+        np.maximum(self.limit, self.min_diff**2, out=self.limit)
+        thresh = cv2.compare(self.sqdiff, self.limit, cv2.CMP_GT, dst=dst)
+
+        if learn:
+            self.count += 1
+            rate = max(self.rate, 1.0/self.count)
+            cv2.bitwise_not(thresh, dst=self.still)
+            cv2.accumulateWeighted(self.sqdiff, self.var, rate, mask=self.still)
+            cv2.accumulateWeighted(gray, self.mean, rate)
+        return thresh
+
+    def background(self):
+        """Returns the current mean image as uint8, or None before any frame."""
+        if self.mean is None:
+            return None
+        return cv2.convertScaleAbs(self.mean)
+
+class ApproxMedianBackground:
+    """
+    Streaming approximation of the per-pixel median of frames: each frame
+    moves the estimate one grey level towards itself. Memory use is that of
+    a single frame, however many frames are seen, and the estimate tracks
+    the median of recent frames as long as the background changes by less
+    than one grey level per frame learnt from.
+
+    Works on greyscale or colour frames. As a detector, a pixel is
+    foreground when it differs from the estimate by more than min_diff.
+    """
+
+    colour = False # as a detector, apply() takes greyscale frames
+
+    def __init__(self, min_diff=25):
+        self.min_diff = min_diff
+        self.median = None
+
+    def update(self, frame):
+        """Moves the estimate towards frame, which must be uint8."""
+        if self.median is None or self.median.shape != frame.shape:
+            self.median = frame.copy()
+            self.above = np.zeros(frame.shape, dtype=bool)
+            self.below = np.zeros(frame.shape, dtype=bool)
+            self.diff = np.zeros(frame.shape, dtype=np.uint8)
+            return
+        np.greater(frame, self.median, out=self.above)
+        np.less(frame, self.median, out=self.below)
+        np.add(self.median, self.above, out=self.median, casting="unsafe")
+        np.subtract(self.median, self.below, out=self.median, casting="unsafe")
+
+    def apply(self, gray, learn=True, dst=None):
+        """
+        Parameters and return value are as in RunningBackground.apply.
+        """
+        if learn or self.median is None or self.median.shape != gray.shape:
+            self.update(gray)
+        cv2.absdiff(gray, self.median, dst=self.diff)
+        _, thresh = cv2.threshold(self.diff, self.min_diff, 255,
+                                    cv2.THRESH_BINARY, dst=dst)
+        return thresh
+
+    def background(self):
+        """
+        Returns the current estimate (not a copy), or None before any frame.
+        """
+        return self.median
+
+class SubtractorBackground:
+    """
+    Wraps one of OpenCV's background subtractors (e.g.,
+    cv2.createBackgroundSubtractorMOG2) with the interface of
+    RunningBackground. Works on colour frames.
+    """
+
+    colour = True
+
+    def __init__(self, subtractor, rate=BACKGROUND_RATE):
+        self.subtractor = subtractor
+        self.rate = rate
+
+    def apply(self, frame, learn=True, dst=None):
+        """
+        Parameters and return value are as in RunningBackground.apply.
+        """
+        rate = self.rate if learn else 0.0
+        if dst is None:
+            return self.subtractor.apply(frame, learningRate=rate)
+        return self.subtractor.apply(frame, fgmask=dst, learningRate=rate)
+
+    def background(self):
+        """Returns the subtractor's background image."""
+        return self.subtractor.getBackgroundImage()
+
 def detect_and_draw_contours(frame, thresh, meas_last,
                                 meas_now, min_area = 0, max_area=10000,
                                 draw_contours=True):
@@ -105,42 +295,259 @@ def detect_and_draw_contours(frame, thresh, meas_last,
     """
 
     # Detect contours and draw them based on specified area thresholds
-    if int(cv2.__version__[0]) == 3:
-        _, contours, _ = cv2.findContours(thresh.copy(),
-                                                    cv2.RETR_TREE,
-                                                    cv2.CHAIN_APPROX_SIMPLE
-                                                )
-    else:
-        contours, _ = cv2.findContours(thresh.copy(),
-                                                    cv2.RETR_TREE,
-                                                    cv2.CHAIN_APPROX_SIMPLE
-                                                )
+    contours, centroids = find_contours(thresh, min_area, max_area)
 
     final = frame.copy()
 
-    i = 0
     if meas_last is not None:
         meas_last = meas_now[:]
-        del meas_now[:]
-
-    while i < len(contours):
-        area = cv2.contourArea(contours[i])
-        if min_area < area < max_area:
-            if draw_contours:
-                cv2.drawContours(final, contours, i, (0,0,255), 2)
-            mom = cv2.moments(contours[i])
-            if mom['m00']:
-                cx = mom['m10']/mom['m00']
-                cy = mom['m01']/mom['m00']
-
-            if meas_last is not None:
-                meas_now.append([cx,cy])
-            i += 1
-        else:
-            contours = contours[:i] + contours[i+1:]
+        meas_now[:] = centroids
+
+    if draw_contours:
+        cv2.drawContours(final, contours, -1, (0,0,255), 2)
 
     return final, contours, meas_last, meas_now
 
+def detect_and_draw_components(frame, thresh, meas_last,
+                                meas_now, min_area = 0, max_area=10000,
+                                draw_contours=True):
+    """
+    Same as detect_and_draw_contours, but finds objects as connected
+    components of the thresholded image. Areas, bounding boxes and centroids
+    of all components come from a single call and are filtered with numpy,
+    which stays fast on noisy frames with thousands of specks. Areas are pixel
+    counts, slightly larger than the polygon areas of the corresponding
+    contours.
+
+    Parameters
+    ----------
+    frame: ndarray, shape(n_rows, n_cols, 3)
+        source image containing all three colour channels
+    thresh: ndarray, shape(n_rows, n_cols, 1)
+        binarised(0,255) image
+    meas_last: array_like, dtype=float
+        individual's location on previous frame
+    meas_now: array_like, dtype=float
+        individual's location on current frame
+    min_area: int
+        minimum area threhold used to detect the object of interest
+    max_area: int
+        maximum area threhold used to detect the object of interest
+    draw_contours: bool
+        whether to draw detected contours on frame
+
+    Returns
+    -------
+    final: ndarray, shape(n_rows, n_cols, 3)
+        final output image composed of the input frame with object contours
+        overlaid on it if specified
+    contours: BlobContours
+        contours of all components that pass the area based threhold
+        criterion, traced only when accessed
+    meas_last: array_like, dtype=float
+        individual's location on previous frame
+    meas_now: array_like, dtype=float
+        individual's location on current frame
+    """
+
+    contours, centroids = find_components(thresh, min_area, max_area)
+
+    final = frame.copy()
+
+    if meas_last is not None:
+        meas_last = meas_now[:]
+        meas_now[:] = centroids
+
+    if draw_contours:
+        cv2.drawContours(final, list(contours), -1, (0,0,255), 2)
+
+    return final, contours, meas_last, meas_now
+
+def find_contours(thresh, min_area=0, max_area=10000):
+    """
+    Finds contours in a thresholded image whose areas lie strictly between
+    min_area and max_area, and their centroids. Used by
+    detect_and_draw_contours.
+
+    Parameters
+    ----------
+    thresh: ndarray, shape(n_rows, n_cols, 1)
+        binarised(0,255) image, left unmodified
+    min_area: int
+        minimum area threhold used to detect the object of interest
+    max_area: int
+        maximum area threhold used to detect the object of interest
+
+    Returns
+    -------
+    contours: list
+        contours that pass the area based threhold criterion
+    centroids: list
+        [x, y] centroid of each contour
+    """
+    # findContours leaves its input unmodified since OpenCV 3.2
+    contours = cv2.findContours(thresh,
+                                    cv2.RETR_TREE,
+                                    cv2.CHAIN_APPROX_SIMPLE
+                                )[-2]
+    kept = []
+    centroids = []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if not min_area < area < max_area:
+            continue
+        mom = cv2.moments(contour)
+        if not mom['m00']:
+            continue
+        kept.append(contour)
+        centroids.append([mom['m10']/mom['m00'], mom['m01']/mom['m00']])
+    return kept, centroids
+
+def find_components(thresh, min_area=0, max_area=10000, labels=None):
+    """
+    Finds connected components in a thresholded image whose pixel counts lie
+    strictly between min_area and max_area, and their centroids. Used by
+    detect_and_draw_components.
+
+    Parameters
+    ----------
+    thresh: ndarray, shape(n_rows, n_cols, 1)
+        binarised(0,255) image
+    min_area: int
+        minimum area threhold used to detect the object of interest
+    max_area: int
+        maximum area threhold used to detect the object of interest
+    labels: ndarray, shape(n_rows, n_cols), dtype=int32, optional
+        buffer to write the label image into, instead of a new array
+
+    Returns
+    -------
+    contours: BlobContours
+        contours of components that pass the area based threhold criterion,
+        traced only when accessed, and only valid while labels is unchanged
+    centroids: list
+        [x, y] centroid of each component
+    """
+    _, labels, stats, centroids = cv2.connectedComponentsWithStats(thresh,
+                                                    labels=labels,
+                                                    connectivity=8,
+                                                    ltype=cv2.CV_32S
+                                                )
+    areas = stats[1:, cv2.CC_STAT_AREA] # label 0 is the background
+    keep = np.flatnonzero((areas > min_area) & (areas < max_area)) + 1
+    return BlobContours(labels, keep, stats[keep]), centroids[keep].tolist()
+
+class BlobContours(collections.abc.Sequence):
+    """
+    List-like collection of contours of connected components, as returned by
+    detect_and_draw_components. Contours are traced from the label image only
+    the first time any of them is accessed, e.g. for drawing or k-means.
+    Bounding boxes, areas and pixels of blobs are available without tracing,
+    through ``boxes``, ``areas`` and ``pixels()``.
+
+    Coordinate transforms (rescaled, shifted) and concatenation (+) return
+    new collections and are also deferred until tracing.
+    """
+
+    def __init__(self, labels, ids, stats):
+        """
+        Parameters
+        ----------
+        labels: ndarray, shape(n_rows, n_cols)
+            label image from cv2.connectedComponentsWithStats
+        ids: array_like, dtype=int
+            labels of the components to include
+        stats: ndarray, shape(n, 5)
+            (x, y, width, height, area) of each component, as from
+            cv2.connectedComponentsWithStats
+        """
+        # each part: labels, ids, stats, and the transform p -> p*scale + shift
+        self.parts = [(labels, np.asarray(ids), np.asarray(stats), 1.0,
+                        np.zeros(2))]
+        self._contours = None
+
+    @classmethod
+    def _from_parts(cls, parts):
+        new = cls.__new__(cls)
+        new.parts = parts
+        new._contours = None
+        return new
+
+    def __len__(self):
+        return sum(len(ids) for _, ids, _, _, _ in self.parts)
+
+    def __getitem__(self, i):
+        return self.materialize()[i]
+
+    def __add__(self, other):
+        return self._from_parts(self.parts + other.parts)
+
+    def rescaled(self, scaling):
+        """
+        Maps contours found on a frame resized by scaling back to pixel
+        coordinates of the original frame (see trackutils.get_contours).
+        """
+        return self._from_parts([
+                    (labels, ids, stats, a/scaling, b/scaling + 0.5/scaling - 0.5)
+                    for labels, ids, stats, a, b in self.parts
+                ])
+
+    def shifted(self, dx, dy):
+        """Moves all contours by (dx, dy) pixels."""
+        return self._from_parts([
+                    (labels, ids, stats, a, b + np.array([dx, dy]))
+                    for labels, ids, stats, a, b in self.parts
+                ])
+
+    @property
+    def boxes(self):
+        """(n, 4) array of (x, y, width, height) of each contour."""
+        out = [np.column_stack((stats[:, :2]*a + b, stats[:, 2:4]*a))
+                    for _, _, stats, a, b in self.parts]
+        if not out:
+            return np.zeros((0, 4))
+        return np.concatenate(out)
+
+    @property
+    def areas(self):
+        """(n,) array of the area of each blob, in pixels."""
+        out = [stats[:, 4]*a**2 for _, _, stats, a, _ in self.parts]
+        if not out:
+            return np.zeros(0)
+        return np.concatenate(out)
+
+    def pixels(self, i):
+        """(m, 2) array of (x, y) coordinates of all pixels of the i-th blob."""
+        for labels, ids, stats, a, b in self.parts:
+            if i >= len(ids):
+                i -= len(ids)
+                continue
+            x, y, w, h = stats[i, :4]
+            ys, xs = np.nonzero(labels[y:y+h, x:x+w] == ids[i])
+            return np.column_stack((xs + x, ys + y))*a + b
+        raise IndexError("blob index out of range")
+
+    def materialize(self):
+        """Traces (once) and returns the contours as a list of arrays."""
+        if self._contours is not None:
+            return self._contours
+
+        contours = []
+        for labels, ids, stats, a, b in self.parts:
+            for lab, (x, y, w, h) in zip(ids, stats[:, :4]):
+                mask = (labels[y:y+h, x:x+w] == lab).astype(np.uint8)
+                found = cv2.findContours(mask,
+                                            cv2.RETR_EXTERNAL,
+                                            cv2.CHAIN_APPROX_SIMPLE,
+                                            offset=(int(x), int(y))
+                                        )[-2]
+                contour = max(found, key=len)
+                if a != 1.0 or b.any():
+                    contour = (contour*a + b).round().astype(np.int32)
+                contours.append(contour)
+        self._contours = contours
+        return contours
+
 def apply_k_means(contours, n_inds, meas_now):
     """
     This function applies the k-means clustering algorithm to separate merged
@@ -181,7 +588,13 @@ def apply_k_means(contours, n_inds, meas_now):
         meas_now.append([x,y])
     return contours, meas_now
 
-def hungarian_algorithm(meas_last, meas_now):
+# Up to this many individuals, assignments are solved in one go: building
+# and splitting the graph of gated pairs costs about a millisecond, which
+# the dense solver only exceeds beyond about 400 individuals (see
+# benchmarks/bench_assignment.py).
+DENSE_ASSIGNMENT_LIMIT = 300
+
+def hungarian_algorithm(meas_last, meas_now, gate=None):
     """
     The hungarian algorithm is a combinatorial optimisation algorithm used
     to solve assignment problems. Here, we use the algorithm to reduce noise
@@ -197,6 +610,12 @@ def hungarian_algorithm(meas_last, meas_now):
         individual's location on previous frame
     meas_now: array_like, dtype=float
         individual's location on current frame
+    gate: float(optional), default = None
+        for more than DENSE_ASSIGNMENT_LIMIT individuals, the distance beyond
+        which a location is matched to an individual only if neither finds a
+        match within this distance; three times the median distance of an
+        individual to its nearest location if None. The result is optimal if
+        the gate exceeds every distance in the optimal assignment.
         
     Returns
     -------
@@ -206,24 +625,87 @@ def hungarian_algorithm(meas_last, meas_now):
         individual identities rearranged based on matching locations from 
         ``meas_last`` to ``meas_now`` by minimising the cost function
     """
-    meas_last = np.array(meas_last)
-    meas_now = np.array(meas_now)
-    if meas_now.shape != meas_last.shape:
-        if meas_now.shape[0] < meas_last.shape[0]:
-            while meas_now.shape[0] != meas_last.shape[0]:
-                meas_last = np.delete(meas_last, meas_last.shape[0]-1, 0)
-        else:
-            result = np.zeros(meas_now.shape)
-            result[:meas_last.shape[0],:meas_last.shape[1]] = meas_last
-            meas_last = result
-
-    meas_last = list(meas_last)
-    meas_now = list(meas_now)
-
-    cost = cdist(meas_last, meas_now)
-    row_ind, col_ind = linear_sum_assignment(cost)
+    meas_last = np.asarray(meas_last, dtype=float).reshape(-1, 2)
+    meas_now = np.asarray(meas_now, dtype=float).reshape(-1, 2)
+    n = len(meas_now)
+    if len(meas_last) > n:
+        meas_last = meas_last[:n]
+    elif len(meas_last) < n:
+        meas_last = np.vstack((meas_last, np.zeros((n - len(meas_last), 2))))
+
+    row_ind = np.arange(n)
+    if n == 0:
+        return row_ind, row_ind.copy()
+
+    # If every individual's nearest location is a different one, matching
+    # each to its nearest attains the lower bound of the total cost, so it
+    # is optimal.
+    tree_now = cKDTree(meas_now)
+    nearest_dist, nearest = tree_now.query(meas_last)
+    nearest = np.asarray(nearest)
+    if len(np.unique(nearest)) == n:
+        return row_ind, nearest
+
+    if n <= DENSE_ASSIGNMENT_LIMIT:
+        return linear_sum_assignment(cdist(meas_last, meas_now))
+    if gate is None:
+        gate = 3*np.median(nearest_dist)
+    col_ind = _gated_assignment(meas_last, meas_now, tree_now, max(gate, 1.0))
     return row_ind, col_ind
 
+def _gated_assignment(meas_last, meas_now, tree_now, gate):
+    """
+    Solves the assignment between meas_last and meas_now (of equal lengths),
+    considering only pairs closer than gate. Groups of individuals and
+    locations that are linked by such pairs, and that hold as many
+    individuals as locations, are solved independently: pairs linked only to
+    each other directly, other groups one by one. Everyone else (in groups
+    with more individuals than locations or vice versa, or with nothing
+    within the gate) is matched in one go.
+    """
+    n = len(meas_now)
+    pairs = cKDTree(meas_last).sparse_distance_matrix(tree_now, gate,
+                                                output_type="ndarray")
+    # bipartite graph: nodes 0..n-1 are individuals, n..2n-1 are locations
+    graph = coo_matrix((np.ones(len(pairs)), (pairs["i"], pairs["j"] + n)),
+                        shape=(2*n, 2*n))
+    n_comp, comp = connected_components(graph, directed=False)
+    rows_comp, cols_comp = comp[:n], comp[n:]
+    n_rows = np.bincount(rows_comp, minlength=n_comp)
+    n_cols = np.bincount(cols_comp, minlength=n_comp)
+    col_ind = np.full(n, -1)
+
+    # the usual case: one individual and one location linked only to each
+    # other
+    simple = (n_rows == 1) & (n_cols == 1)
+    col_of_comp = np.full(n_comp, -1)
+    col_of_comp[cols_comp] = np.arange(n)
+    matched = simple[rows_comp]
+    col_ind[matched] = col_of_comp[rows_comp[matched]]
+
+    # other balanced groups one by one, with members listed contiguously per
+    # group
+    rows_order = np.argsort(rows_comp, kind="stable")
+    cols_order = np.argsort(cols_comp, kind="stable")
+    rows_start = np.searchsorted(rows_comp[rows_order], np.arange(n_comp + 1))
+    cols_start = np.searchsorted(cols_comp[cols_order], np.arange(n_comp + 1))
+    for c in np.flatnonzero((n_rows == n_cols) & (n_rows > 1)):
+        rows = rows_order[rows_start[c]:rows_start[c+1]]
+        cols = cols_order[cols_start[c]:cols_start[c+1]]
+        r, k = linear_sum_assignment(cdist(meas_last[rows], meas_now[cols]))
+        col_ind[rows[r]] = cols[k]
+
+    # unbalanced groups and the ungated are left to share what remains
+    left_rows = np.flatnonzero(col_ind < 0)
+    if len(left_rows) > 0:
+        taken = np.zeros(n, dtype=bool)
+        taken[col_ind[col_ind >= 0]] = True
+        left_cols = np.flatnonzero(~taken)
+        r, k = linear_sum_assignment(cdist(meas_last[left_rows],
+                                            meas_now[left_cols]))
+        col_ind[left_rows[r]] = left_cols[k]
+    return col_ind
+
 def reorder_and_draw(final, colours, n_inds,
                         col_ind, meas_now,
                         mot, fr_no, draw_circles=True):
@@ -264,13 +746,8 @@ def reorder_and_draw(final, colours, n_inds,
         this dataframe holds tracked coordinates i.e. the tracking results
     """
     # Reorder contours based on results of the hungarian algorithm
-    equal = np.array_equal(col_ind, list(range(len(col_ind))))
-    if not equal:
-        current_ids = col_ind.copy()
-        reordered = [i[0] for i in sorted(enumerate(current_ids),
-                                            key=lambda x:x[1]
-                                        )]
-        meas_now = [x for (y,x) in sorted(zip(reordered,meas_now))]
+    if not np.array_equal(col_ind, np.arange(len(col_ind))):
+        meas_now = np.asarray(meas_now, dtype=float)[col_ind].tolist()
 
     # Draw centroids
     if not mot:
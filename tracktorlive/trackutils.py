@@ -6,21 +6,41 @@
 suite of helper functions to aid in tracking objects in video
 """
 
+import collections
+import threading
+import time
+
 import cv2
+import numpy as np
 
 from . import config
+from . import preprocess as pp
+from . import splitting
 from . import tracktor as tr
 
+CAMERA_RETRIES = 8 # failed reads in a row before a camera is given up
+RETRY_WAIT = 0.05 # seconds waited after a failed read, doubled every time
+RETRY_WAIT_MAX = 1.0 # seconds
+REOPEN_AFTER = 2 # failed reads in a row before the source is reopened
+# raw layouts whose luminance to_gray can take without colour conversion
+RAW_GRAY_FOURCCS = ("YUYV", "YUY2", "GREY", "Y800")
+
 class VideoEndedError(IOError):
     """Raised when a video has reached its end."""
     def __init__(self, message="The video has ended."):
         super().__init__(message)
 
-def get_vid(source):
+def get_vid(source, grayscale=False):
     """
     Gets a cv2.VideoCapture object from given source
     Args:
         source (int or str): filename or camera device number
+        grayscale (bool): whether frames will be read with grayscale=True
+            (see get_frame). Cameras are then asked for their raw frames,
+            whose luminance (Y) plane is used without colour conversion,
+            where the backend allows it (e.g. V4L2 with YUYV). Cameras that
+            settle on another format (e.g. MJPG) are read in BGR, and
+            converted.
     Returns:
         cv2.VideoCapture object
     """
@@ -31,19 +51,80 @@ def get_vid(source):
 
     codec = config.settings['fourcc_read_codec']
     cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*codec))
+    if grayscale and vidtype == "cam":
+        # files are not asked: raw decoding of files is often slower
+        if fourcc_name(cap.get(cv2.CAP_PROP_FOURCC)) in RAW_GRAY_FOURCCS:
+            cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
     return cap
 
-def get_frame(cap):
+def fourcc_name(code):
+    """Returns the four characters of a FOURCC code, as from cap.get()."""
+    code = int(code)
+    return "".join(chr((code >> 8*i) & 0xFF) for i in range(4))
+
+def frame_size(cap, frame):
+    """
+    Returns (width, height) of frames from cap, given one frame as read
+    from it, which may be a raw (e.g. packed YUYV) buffer.
+    """
+    if frame.ndim == 3 and frame.shape[2] in (1, 3):
+        return frame.shape[1], frame.shape[0]
+    W = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    H = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if frame.ndim == 2 and frame.shape != (H, W) and frame.size != 2*H*W:
+        return frame.shape[1], frame.shape[0]
+    return W, H
+
+def to_gray(frame, out):
+    """
+    Writes the luminance of frame into out.
+
+    Args:
+        frame (np.ndarray): BGR frame, single-channel frame, or raw packed
+            YUYV frame (two bytes per pixel, Y first) as read with
+            CAP_PROP_CONVERT_RGB off.
+        out (np.ndarray): (height, width) uint8 array.
+    Returns:
+        out
+    """
+    H, W = out.shape
+    if frame.ndim == 3 and frame.shape[2] == 3:
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=out)
+    if frame.size == H*W:
+        np.copyto(out, frame.reshape(H, W))
+        return out
+    if frame.size == 2*H*W:# YUYV: the Y plane is every other byte
+        return cv2.extractChannel(frame.reshape(H, W, 2), 0, dst=out)
+    raise ValueError(f"cannot get a {W}x{H} grayscale frame from a frame of"
+                        f" shape {frame.shape}")
+
+def get_frame(cap, out=None, grayscale=False, raw=None):
     """
-    gets one frame from cap
+    gets one frame from cap. To read many frames, use a Capture instead,
+    which avoids querying the backend for every frame.
     Args:
         cap (cv2.VideoCapture)
+        out (np.ndarray, optional): preallocated array to decode into
+        grayscale (bool): return a single-channel (height, width) frame
+            (see to_gray); out, if given, must be of that shape
+        raw (np.ndarray, optional): preallocated array for the frame as
+            decoded, before conversion to grayscale
     Returns:
         frame, frame_index
     """
 
     assert cap.isOpened()
-    ret, frame = cap.read()
+    if grayscale:
+        ret, decoded = cap.read(raw)
+        if ret:
+            if out is None:
+                W, H = frame_size(cap, decoded)
+                out = np.empty((H, W), dtype=np.uint8)
+            frame = to_gray(decoded, out)
+    elif out is None:
+        ret, frame = cap.read()
+    else:
+        ret, frame = cap.read(out)
     if not ret:
         raise VideoEndedError("frame could not be obtained")
     frame_index = cap.get(cv2.CAP_PROP_POS_FRAMES)
@@ -51,15 +132,612 @@ def get_frame(cap):
     return frame, frame_index
 
 
+class Capture:
+    """
+    Reads frames from a cv2.VideoCapture, keeping count of frames itself
+    instead of asking the backend for its position after every frame (an
+    ioctl on some camera drivers, and meaningless for cameras anyway).
+
+    Reading is split as in OpenCV: grab() advances to the next frame without
+    decoding it, and retrieve() decodes the frame grabbed last, so that
+    frames to be dropped need not be decoded. The backend's timestamp of
+    each decoded frame (CAP_PROP_POS_MSEC) is recorded in msec, as long as
+    it is reliable, i.e., increases from frame to frame; otherwise msec is
+    None and the backend is not asked again. Frames only grabbed, e.g. to
+    be skipped, cost no query.
+
+    Reads from cameras may fail for a moment; read() can retry them, and
+    reopen the device through opener.
+
+    Other attributes and methods (set, get, release, ...) are those of the
+    wrapped cv2.VideoCapture.
+    """
+
+    def __init__(self, cap, grayscale=False, raw_shape=None, timestamps=True,
+                    opener=None):
+        """
+        Args:
+            cap (cv2.VideoCapture): opened capture, e.g. from get_vid().
+            grayscale (bool): deliver single-channel frames (see to_gray).
+            raw_shape (tuple, optional): shape of frames as decoded, before
+                conversion to grayscale, to preallocate a buffer for them.
+            timestamps (bool): whether to record backend timestamps at all.
+            opener (callable, optional): returns a newly opened
+                cv2.VideoCapture of the same source, to replace cap when
+                reads keep failing (see read()).
+        """
+        if not cap.isOpened():
+            raise IOError("video source is not open")
+        self.cap = cap
+        self.grayscale = grayscale
+        self.raw = None # frame as decoded, before conversion to grayscale
+        if grayscale and raw_shape is not None:
+            self.raw = np.empty(raw_shape, dtype=np.uint8)
+        self.frame_index = max(int(cap.get(cv2.CAP_PROP_POS_FRAMES)), 0)
+        self.timestamps = timestamps
+        self.msec = None
+        self.opener = opener
+        self.failures = 0 # failed reads so far
+
+    def __getattr__(self, name):
+        # everything else is the VideoCapture's
+        if name == "cap":
+            raise AttributeError(name)
+        return getattr(self.cap, name)
+
+    def grab(self):
+        """
+        Advances to the next frame without decoding it.
+
+        Returns:
+            frame_index of the grabbed frame, counting from 1.
+
+        Raises:
+            VideoEndedError: if no frame could be grabbed.
+        """
+        if not self.cap.grab():
+            raise VideoEndedError("frame could not be obtained")
+        self.frame_index += 1
+        return self.frame_index
+
+    def skip(self, n):
+        """Grabs n frames without decoding any, see grab()."""
+        for _ in range(n):
+            self.grab()
+        return self.frame_index
+
+    def retrieve(self, out=None):
+        """
+        Decodes the frame grabbed last, and records its timestamp in msec.
+
+        Args:
+            out (np.ndarray, optional): preallocated array to decode into.
+
+        Returns:
+            frame
+
+        Raises:
+            VideoEndedError: if the frame could not be decoded.
+        """
+        if self.grayscale:
+            ret, decoded = self.cap.retrieve(self.raw)
+            if ret:
+                if self.raw is None:
+                    self.raw = decoded
+                if out is None:
+                    W, H = frame_size(self.cap, decoded)
+                    out = np.empty((H, W), dtype=np.uint8)
+                frame = to_gray(decoded, out)
+        else:
+            ret, frame = self.cap.retrieve(out)
+        if not ret:
+            raise VideoEndedError("frame could not be decoded")
+        if self.timestamps:
+            msec = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            if msec < 0 or (self.msec is not None and msec <= self.msec):
+                self.timestamps = False
+                msec = None
+            self.msec = msec
+        return frame
+
+    def read(self, out=None, retries=0):
+        """
+        Grabs and decodes the next frame.
+
+        Args:
+            out (np.ndarray, optional): preallocated array to decode into.
+            retries (int): how many more times to try if reading fails, each
+                time after waiting twice as long (RETRY_WAIT up to
+                RETRY_WAIT_MAX), and after reopening the source (see opener)
+                from the REOPEN_AFTER-th failure on.
+
+        Returns:
+            frame, frame_index
+
+        Raises:
+            VideoEndedError: if no frame could be read.
+        """
+        failures = 0
+        while True:
+            try:
+                self.grab()
+                return self.retrieve(out), self.frame_index
+            except VideoEndedError:
+                self.failures += 1
+                failures += 1
+                if failures > retries:
+                    raise
+            time.sleep(min(RETRY_WAIT*2**(failures - 1), RETRY_WAIT_MAX))
+            if failures >= REOPEN_AFTER and self.opener is not None:
+                self.reopen()
+
+    def reopen(self):
+        """
+        Replaces the wrapped cv2.VideoCapture with a new one from opener,
+        keeping the count of frames. Returns whether that succeeded.
+        """
+        self.cap.release()
+        try:
+            cap = self.opener()
+        except (AssertionError, IOError, cv2.error):# not back yet
+            return False
+        if not cap.isOpened():
+            return False
+        self.cap = cap
+        self.msec = None # the new capture's clock may start anew
+        return True
+
+    def seek(self, frame_index):
+        """
+        Moves to a frame of a video file, so that the next frame read is the
+        one after frame_index frames.
+        """
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        self.frame_index = int(frame_index)
+        self.msec = None
+
+
+class ThreadedCapture:
+    """
+    Decodes frames from a Capture in a background thread, so that decoding
+    overlaps with tracking.
+
+    Frames are decoded into a small pool of reusable buffers. With
+    latest_only=False (for files), up to queue_size frames are decoded ahead
+    and every frame is delivered. With latest_only=True (for cameras), only
+    the newest decoded frame is kept, and older undelivered ones are dropped
+    and counted in `skipped`.
+
+    Set the driver's own buffer to a minimum (CAP_PROP_BUFFERSIZE) for
+    latest_only to be effective.
+
+    With stride > 1, only every stride-th frame is decoded; the others are
+    grabbed and dropped without decoding, and are not counted in `skipped`.
+
+    A failed read is retried up to retries times (see Capture.read) before
+    the thread gives up, and read() raises VideoEndedError.
+    """
+
+    def __init__(self, cap, shape, queue_size=4, latest_only=False,
+                    stride=1, retries=0):
+        """
+        Args:
+            cap (Capture): opened capture, used only by the thread from now
+                on.
+            shape (tuple): shape of decoded frames.
+            queue_size (int): how many frames may be decoded ahead.
+            latest_only (bool): keep only the newest frame.
+            stride (int): deliver only every stride-th frame.
+            retries (int): failed reads in a row retried, e.g.
+                CAMERA_RETRIES for cameras.
+        """
+        self.cap = cap
+        self.stride = stride
+        self.retries = retries
+        self.latest_only = latest_only
+        self.queue_size = 1 if latest_only else queue_size
+        # queued frames, plus one held by the reader and one being decoded
+        self.free = [np.empty(shape, dtype=np.uint8)
+                        for i in range(self.queue_size + 2)]
+        self.ready = collections.deque()
+        self.held = None
+        self.skipped = 0
+        self.error = None
+        self.running = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """Starts decoding."""
+        self.running = True
+        self.thread.start()
+
+    def _run(self):
+        try:
+            while self.running:
+                with self.cond:
+                    while not self.free and self.running:
+                        self.cond.wait()
+                    if not self.running:
+                        break
+                    buf = self.free.pop()
+
+                self.cap.skip(self.stride - 1)
+                frame, frame_index = self.cap.read(buf, retries=self.retries)
+                t_capture = time.time()
+                msec = self.cap.msec
+
+                with self.cond:
+                    n_skipped = 0
+                    if self.latest_only and self.ready:
+                        old = self.ready.popleft()
+                        self.free.append(old[0])
+                        n_skipped = old[3] + 1
+                        self.skipped += 1
+                    self.ready.append((frame, frame_index, t_capture,
+                                        n_skipped, msec))
+                    self.cond.notify_all()
+        except Exception as e:# VideoEndedError, or anything else in decoding
+            with self.cond:
+                self.error = e
+                self.ready.append(None)
+                self.cond.notify_all()
+
+    def read(self, timeout=None):
+        """
+        Returns the next frame, its index, its capture time (time.time()),
+        how many frames were dropped right before it, and its backend
+        timestamp (see Capture). The frame stays valid until the next call
+        of read().
+
+        Raises:
+            VideoEndedError: if no more frames can be obtained.
+            TimeoutError: if no frame arrived within timeout seconds.
+        """
+        with self.cond:
+            if self.held is not None:
+                self.free.append(self.held)
+                self.held = None
+                self.cond.notify_all()
+
+            if not self.cond.wait_for(lambda: self.ready, timeout):
+                raise TimeoutError("no frame decoded in time")
+            item = self.ready.popleft()
+            if item is None:
+                self.ready.append(None) # stay ended for later calls
+                if isinstance(self.error, VideoEndedError):
+                    raise self.error
+                raise VideoEndedError(f"capture failed: {self.error}")
+            self.held = item[0]
+        return item
+
+    def stop(self):
+        """Stops decoding and waits for the thread to finish."""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.thread.join(timeout=1.0)
+
+
+class Detector:
+    """
+    Finds objects in video frames: thresholds a frame (see
+    tracktor.colour_to_thresh), or compares it with a background model (see
+    tracktor.background_model), and extracts blobs from it, optionally at a
+    reduced resolution or only within some windows of the frame. Frames may
+    first go through a preprocessing chain (see preprocess.Preprocessor),
+    in which case only the region it crops to is searched.
+
+    All intermediate images (resized, blurred, grey and thresholded frames,
+    the label image, and the annotated frame) are written into scratch
+    buffers allocated once, so that detection allocates no new full-frame
+    arrays in the steady state. Buffers grow if a larger frame comes along.
+    """
+
+    def __init__(self, shape, block_size, offset, min_area, max_area,
+                    scaling=1.0, invert=True, backend="contours",
+                    background=None, background_every=1,
+                    background_rate=tr.BACKGROUND_RATE, preprocess=None,
+                    fps=None):
+        """
+        Args:
+            shape (tuple): shape of the frames to expect, e.g. (480, 640, 3).
+            block_size (int): Size of the neighborhood for adaptive
+                thresholding, at full resolution.
+            offset (int): Offset value subtracted during adaptive thresholding.
+            min_area (int): Minimum area for a blob to be considered valid,
+                at full resolution.
+            max_area (int): Maximum area for a blob to be considered valid,
+                at full resolution.
+            scaling (float): Scale factor at which detection is run. Returned
+                contours and centroids are in full-resolution pixels.
+            invert (bool): Whether to invert the thresholded image.
+            backend (str): How objects are found in the thresholded frame,
+                "contours" (tracktor.find_contours) or "components"
+                (tracktor.find_components).
+            background (str, optional): If given, objects are whatever
+                differs from a background model of this kind (see
+                tracktor.background_model) instead of what adaptive
+                thresholding picks out. block_size and invert are then
+                unused, and offset is the smallest difference in grey level
+                from the background that counts.
+            background_every (int): The background model learns from one
+                frame in this many; all frames are compared with it.
+            background_rate (float): Weight of each frame the background
+                model learns from.
+            preprocess (list, optional): steps of a preprocessing chain
+                applied before thresholding, see preprocess.py.
+            fps (float, optional): unused, accepted so that tracking
+                parameters can be passed as they are.
+        """
+        del fps
+        if backend not in ("contours", "components"):
+            raise ValueError(f"unknown detection backend: {backend}")
+        self.background = None
+        if background is not None:
+            self.background = tr.background_model(background,
+                                        min_diff=offset, rate=background_rate)
+        self.background_every = max(int(background_every), 1)
+        self.frames = 0 # frames thresholded so far
+        self.preprocessor = None
+        if preprocess:
+            # as much margin as blurring and thresholding look at
+            self.preprocessor = pp.Preprocessor(preprocess, shape,
+                                                pad=block_size//2 + 3)
+        self.backend = backend
+        self.scaling = scaling
+        self.offset = offset
+        if scaling == 1.0:
+            self.block_size = block_size | 1
+            self.min_area, self.max_area = min_area, max_area
+        else:
+            self.block_size = max(3, int(block_size*scaling)) | 1
+            self.min_area = min_area*scaling**2
+            self.max_area = max_area*scaling**2
+        if invert:
+            self.threshtype = cv2.THRESH_BINARY_INV
+        else:
+            self.threshtype = cv2.THRESH_BINARY
+
+        self.buffers = {}
+        H, W = shape[:2]
+        h, w = self._scaled_size(H, W)
+        if scaling != 1.0:
+            self._scratch("small", (h, w, *shape[2:]))
+        self._scratch("blurred", (h, w, *shape[2:]))
+        self._scratch("gray", (h, w))
+        self._scratch("thresh", (h, w))
+        if backend == "components":
+            self._scratch("labels", (h, w), np.int32)
+        # the buffer for annotated frames is only allocated once drawn on
+
+    def _scaled_size(self, H, W):
+        # output size of cv2.resize with fx = fy = scaling
+        if self.scaling == 1.0:
+            return H, W
+        return int(round(H*self.scaling)), int(round(W*self.scaling))
+
+    def _scratch(self, name, shape, dtype=np.uint8):
+        """
+        Returns a view of shape shape into the scratch buffer called name,
+        (re)allocating the buffer only if it is too small.
+        """
+        buf = self.buffers.get(name)
+        if buf is None or buf.ndim != len(shape)\
+                or any(b < s for b, s in zip(buf.shape, shape)):
+            if buf is not None:
+                shape_alloc = tuple(max(b, s) for b, s in zip(buf.shape, shape))
+            else:
+                shape_alloc = tuple(shape)
+            buf = np.zeros(shape_alloc, dtype=dtype)
+            self.buffers[name] = buf
+        return buf[tuple(slice(0, s) for s in shape)]
+
+    def threshold(self, image):
+        """
+        Thresholds image at the detection resolution.
+
+        Returns:
+            thresholded image, a view into a scratch buffer that is
+            overwritten by the next call.
+        """
+        H, W = image.shape[:2]
+        h, w = self._scaled_size(H, W)
+        if self.scaling != 1.0:
+            image = cv2.resize(image,
+                                None,
+                                dst=self._scratch("small", (h, w, *image.shape[2:])),
+                                fx=self.scaling,
+                                fy=self.scaling,
+                                interpolation=cv2.INTER_LINEAR
+                            )
+        blurred = cv2.blur(image, (5,5),
+                            dst=self._scratch("blurred", image.shape))
+        if self.background is not None and self.background.colour:
+            return self._subtract(blurred)
+        if blurred.ndim == 2:
+            gray = blurred
+        else:
+            gray = cv2.cvtColor(blurred, cv2.COLOR_BGR2GRAY,
+                                dst=self._scratch("gray", (h, w)))
+        if self.background is not None:
+            return self._subtract(gray)
+        return cv2.adaptiveThreshold(gray,
+                                        255,
+                                        cv2.ADAPTIVE_THRESH_MEAN_C,
+                                        self.threshtype,
+                                        self.block_size,
+                                        self.offset,
+                                        dst=self._scratch("thresh", (h, w))
+                                    )
+
+    def _subtract(self, image):
+        learn = self.frames % self.background_every == 0
+        self.frames += 1
+        return self.background.apply(image, learn=learn,
+                                        dst=self._scratch("thresh",
+                                                            image.shape[:2]))
+
+    def background_image(self):
+        """
+        Returns the background model's current background, at the detection
+        resolution, or None if there is no model or it has seen no frame.
+        """
+        if self.background is None:
+            return None
+        return self.background.background()
+
+    def find(self, image, labels="labels"):
+        """
+        Finds blobs in image.
+
+        Args:
+            image (np.ndarray): image to search.
+            labels (str): name of the scratch buffer holding the label image
+                of the components backend. Contours returned stay valid only
+                until that buffer is reused.
+
+        Returns:
+            contours and [x, y] centroids, in pixels of image.
+        """
+        thresh = self.threshold(image)
+        if self.backend == "components":
+            contours, centroids = tr.find_components(thresh,
+                                        self.min_area, self.max_area,
+                                        labels=self._scratch(labels,
+                                                    thresh.shape, np.int32)
+                                    )
+        else:
+            contours, centroids = tr.find_contours(thresh,
+                                        self.min_area, self.max_area)
+        if self.scaling != 1.0:
+            contours, centroids = _rescale_detections(contours, centroids,
+                                                        self.scaling)
+        return contours, centroids
+
+    def detect(self, frame, meas_last, meas_now, draw_contours=False):
+        """
+        Finds objects in the whole frame.
+
+        Args:
+            frame (np.ndarray): The current video frame.
+            meas_last (list): List of (x, y) coordinates from the previous frame.
+            meas_now (list): List of (x, y) coordinates detected in the current
+                frame (to be updated).
+            draw_contours (bool, default=False): Whether to draw detected
+                contours.
+
+        Returns:
+            processed frame, contours, updated meas_last, updated meas_now.
+            The processed frame is frame itself unless contours are drawn, in
+            which case it is a scratch buffer overwritten by the next call.
+        """
+        if self.preprocessor is None:
+            contours, found = self.find(frame)
+        else:
+            image, x0, y0 = self.preprocessor.apply(frame)
+            contours, found = _shift_detections(*self.find(image), x0, y0)
+        final, meas_last, meas_now = self._finish(frame, contours, found,
+                                                    meas_last, meas_now,
+                                                    draw_contours)
+        return final, contours, meas_last, meas_now
+
+    def detect_windows(self, frame, windows, meas_last, meas_now,
+                            draw_contours=False):
+        """
+        Like detect, but searches for objects only inside the given windows of
+        the frame.
+
+        Args:
+            frame (np.ndarray): The current video frame.
+            windows (list): (x0, y0, x1, y1) windows, as from roi_windows().
+            Remaining arguments are as in detect.
+
+        Returns:
+            processed frame, list of contours, updated meas_last, updated
+            meas_now, and whether the search is trustworthy. It is not if a
+            contour touches the inner edge of a window, i.e., an object may
+            extend beyond it.
+
+        Raises:
+            ValueError: if a background model is used, as it must see whole
+                frames.
+        """
+        if self.background is not None:
+            raise ValueError("windowed detection cannot use a background model")
+        # nothing is searched beyond the preprocessed region, so its edges
+        # are like those of the frame
+        if self.preprocessor is None:
+            X0, Y0, (X1, Y1) = 0, 0, frame.shape[1::-1]
+        else:
+            X0, Y0, X1, Y1 = self.preprocessor.box
+        parts = []
+        found = []
+        complete = True
+        for i, window in enumerate(windows):
+            if self.preprocessor is None:
+                x0, y0, x1, y1 = window
+                image = frame[y0:y1, x0:x1]
+            else:
+                image, x0, y0 = self.preprocessor.apply(frame, window)
+                if image is None:
+                    continue
+                x1, y1 = x0 + image.shape[1], y0 + image.shape[0]
+            # label images of all windows are needed until contours are drawn
+            cnts, pts = self.find(image, labels=f"labels{i}")
+            if isinstance(cnts, tr.BlobContours):
+                boxes = cnts.boxes
+            else:
+                boxes = [cv2.boundingRect(c) for c in cnts]
+            for cx, cy, cw, ch in boxes:
+                if (cx <= 0 and x0 > X0) or (cy <= 0 and y0 > Y0)\
+                        or (cx + cw >= x1 - x0 and x1 < X1)\
+                        or (cy + ch >= y1 - y0 and y1 < Y1):
+                    complete = False
+            cnts, pts = _shift_detections(cnts, pts, x0, y0)
+            parts.append(cnts)
+            found.extend(pts)
+
+        contours = sum(parts[1:], parts[0]) if parts else []
+        final, meas_last, meas_now = self._finish(frame, contours, found,
+                                                    meas_last, meas_now,
+                                                    draw_contours)
+        return final, contours, meas_last, meas_now, complete
+
+    def _finish(self, frame, contours, found, meas_last, meas_now,
+                    draw_contours):
+        if meas_last is not None:
+            meas_last = meas_now[:]
+            meas_now[:] = found
+        final = frame
+        if draw_contours:
+            final = self._scratch("final", frame.shape)
+            np.copyto(final, frame)
+            cv2.drawContours(final, list(contours), -1, (0,0,255), 2)
+        return final, meas_last, meas_now
+
+def _shift_detections(contours, centroids, dx, dy):
+    # moves contours and centroids found in a part of a frame by (dx, dy)
+    if dx == 0 and dy == 0:
+        return contours, centroids
+    if isinstance(contours, tr.BlobContours):
+        contours = contours.shifted(dx, dy)
+    else:
+        contours = [c + np.array([dx, dy], dtype=c.dtype) for c in contours]
+    return contours, [[x + dx, y + dy] for x, y in centroids]
+
 def get_contours(frame, block_size,
                  meas_last, meas_now,
                  min_area, max_area,
                  offset, scaling,
                  fps=None,
                  invert=True,
-                 draw_contours=False):
+                 draw_contours=False,
+                 backend="contours"):
     """
-    Processes a video frame to detect object contours using thresholding and contour detection.
+    Processes a video frame to detect object contours using thresholding and
+    contour detection. Convenience wrapper around Detector for one-off use;
+    to process many frames, keep one Detector instead.
 
     Args:
         frame (np.ndarray): The current video frame.
@@ -69,33 +747,123 @@ def get_contours(frame, block_size,
         min_area (int): Minimum area for a contour to be considered valid.
         max_area (int): Maximum area for a contour to be considered valid.
         offset (int): Offset value subtracted during adaptive thresholding.
-        scaling (float): Scale factor for resizing the input frame.
+        scaling (float): Scale factor at which detection is run. Block size
+            and areas are given at full resolution and adjusted internally;
+            returned contours and centroids are in full-resolution pixels.
         fps (float, optional): Frames per second, unused here but included for compatibility.
         invert (bool, default=True): Whether to invert the thresholded image.
         draw_contours (bool, default=False): Whether to draw detected contours on the frame.
+        backend (str, default="contours"): How objects are found in the
+            thresholded frame, "contours" (tracktor.find_contours) or
+            "components" (tracktor.find_components).
 
     Returns:
         processed frame, list of contours, updated meas_last, updated meas_now
     """
 
-    del fps
-    frame = cv2.resize(frame,
-                            None,
-                            fx=scaling,
-                            fy=scaling,
-                            interpolation=cv2.INTER_LINEAR
-                        )
-    thresh = tr.colour_to_thresh(frame, block_size, offset, invert=invert)
-    final, contours, meas_last, meas_now = tr.detect_and_draw_contours(
-                                            frame,
-                                            thresh,
-                                            meas_last=meas_last,
-                                            meas_now=meas_now,
-                                            min_area=min_area,
-                                            max_area=max_area,
-                                            draw_contours=draw_contours
-                                        )
-    return final, contours, meas_last, meas_now
+    detector = Detector(frame.shape, block_size, offset, min_area, max_area,
+                            scaling=scaling, invert=invert, backend=backend,
+                            fps=fps)
+    return detector.detect(frame, meas_last, meas_now,
+                            draw_contours=draw_contours)
+
+def _rescale_detections(contours, centroids, scaling):
+    """
+    Maps contours and centroids found on a frame resized by scaling back to
+    pixel coordinates of the original frame.
+    """
+    # pixel centres map as x_full = (x_small + 0.5)/scaling - 0.5 in cv2.resize
+    if isinstance(contours, tr.BlobContours):
+        contours = contours.rescaled(scaling)
+    else:
+        contours = [((c + 0.5)/scaling - 0.5).round().astype(np.int32)
+                        for c in contours]
+    centroids = [[(x + 0.5)/scaling - 0.5, (y + 0.5)/scaling - 0.5]
+                    for x, y in centroids]
+    return contours, centroids
+
+def predict_positions(meas_now, meas_prev, n_inds):
+    """
+    Predicts where individuals will be in the next frame, assuming constant
+    velocity between the last two frames.
+
+    Args:
+        meas_now (list): ordered (x, y) positions in the latest frame.
+        meas_prev (list): ordered (x, y) positions in the frame before it, or
+            None if unknown.
+        n_inds (int): number of individuals being tracked.
+
+    Returns:
+        (n_inds, 2) array of predicted positions, or None if either frame
+        did not contain exactly n_inds individuals.
+    """
+    if len(meas_now) != n_inds or meas_prev is None\
+            or len(meas_prev) != n_inds:
+        return None
+    return 2*np.asarray(meas_now, dtype=float)\
+            - np.asarray(meas_prev, dtype=float)
+
+def roi_windows(centres, radius, shape, pad=0):
+    """
+    Returns square windows around given centres, clipped to the frame, with
+    overlapping windows merged into their bounding box.
+
+    Args:
+        centres (np.ndarray): (n, 2) array of (x, y) positions.
+        radius (int): half-width of each window in pixels.
+        shape (tuple): shape of the frame.
+        pad (int): extra margin added on every side.
+
+    Returns:
+        list of (x0, y0, x1, y1) windows, end exclusive.
+    """
+    H, W = shape[:2]
+    r = int(radius) + int(pad)
+    windows = []
+    for x, y in centres:
+        x, y = int(round(x)), int(round(y))
+        win = (max(x - r, 0), max(y - r, 0), min(x + r + 1, W), min(y + r + 1, H))
+        if win[0] < win[2] and win[1] < win[3]:
+            windows.append(win)
+
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(windows)):
+            for j in range(i+1, len(windows)):
+                a, b = windows[i], windows[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    windows[i] = (min(a[0], b[0]), min(a[1], b[1]),
+                                    max(a[2], b[2]), max(a[3], b[3]))
+                    del windows[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return windows
+
+def get_contours_roi(frame, windows, block_size,
+                 meas_last, meas_now,
+                 min_area, max_area,
+                 offset, scaling,
+                 fps=None,
+                 invert=True,
+                 draw_contours=False,
+                 backend="contours"):
+    """
+    Like get_contours, but thresholds and searches for contours only inside
+    the given windows of the frame. See Detector.detect_windows.
+
+    Returns:
+        processed frame, list of contours, updated meas_last, updated meas_now,
+        and whether the search is trustworthy.
+    """
+
+    detector = Detector(frame.shape, block_size, offset, min_area, max_area,
+                            scaling=scaling, invert=invert, backend=backend,
+                            fps=fps)
+    return detector.detect_windows(frame, windows, meas_last, meas_now,
+                                    draw_contours=draw_contours)
 
 
 colours = [(0,0,255), (0,255,0), (255,0,0), (255,0,255),
@@ -105,7 +873,8 @@ def cleanup_centroids(final, contours, n_inds,
                         meas_last, meas_now,
                         mot, frame_index,
                         draw_circles=False,
-                        use_kmeans = True
+                        use_kmeans = True,
+                        splitter=None
                     ):
     """
     Cleans up and associates detected centroids with tracked objects using k-means and
@@ -122,16 +891,33 @@ def cleanup_centroids(final, contours, n_inds,
         draw_circles (bool, default=False): Whether to draw circles on tracked centroids.
         use_kmeans (bool, default=True): Whether to apply k-means clustering when count
                             mismatches.
+        splitter (splitting.BlobSplitter, optional): If given, fewer blobs
+                            than individuals are resolved by splitting only
+                            blobs too large to be one individual, and more
+                            blobs by clustering blob centroids, instead of
+                            clustering all contour points anew.
 
     Returns:
         processed frame, updated meas_now with consistent ordering
     """
 
+    if n_inds == 1:
+        return select_individual(final, contours, meas_last, meas_now,
+                                    frame_index, draw_circles=draw_circles)
+
+    if splitter is not None and len(contours) == len(meas_now) == n_inds:
+        splitter.observe(contours)
+
     if use_kmeans\
             and len(meas_now) != n_inds\
             and len(meas_now) > 0:
 
-        contours, meas_now = tr.apply_k_means(contours, n_inds, meas_now)
+        if splitter is not None and len(meas_now) < n_inds:
+            contours, meas_now = splitter.split(contours, meas_now, meas_last)
+        elif splitter is not None:
+            contours, meas_now = splitter.merge(contours, meas_now, meas_last)
+        else:
+            contours, meas_now = tr.apply_k_means(contours, n_inds, meas_now)
 
     #if len(meas_now) == len(meas_last) and len(meas_now) > 1:
     if len(meas_now) > 0 and len(meas_last) > 0:
@@ -142,3 +928,40 @@ def cleanup_centroids(final, contours, n_inds,
                                                     draw_circles=draw_circles
                                                 )
     return final, meas_now
+
+def select_individual(final, contours, meas_last, meas_now, frame_index,
+                        draw_circles=False):
+    """
+    Fast path of cleanup_centroids when tracking a single individual: keeps
+    only the blob nearest to its last position, or the largest blob if the
+    last position is unknown.
+
+    Args:
+        final (np.ndarray): Frame on which to draw results.
+        contours (list): List of detected contours.
+        meas_last (list): List of centroids from the previous frame.
+        meas_now (list): List of centroids from the current frame, updated
+                            in place.
+        frame_index (int): Index of the current frame (used for labeling).
+        draw_circles (bool, default=False): Whether to draw a circle on the
+                            tracked centroid.
+
+    Returns:
+        processed frame, updated meas_now
+    """
+
+    if len(meas_now) > 1:
+        if len(meas_last) > 0:
+            lx, ly = meas_last[0]
+            dists = [(x - lx)**2 + (y - ly)**2 for x, y in meas_now]
+            best = dists.index(min(dists))
+        else:
+            best = int(np.argmax(splitting.contour_areas(contours)))
+        meas_now[:] = [meas_now[best]]
+
+    if draw_circles and len(meas_now) > 0:
+        cv2.circle(final, tuple(int(x) for x in meas_now[0]), 5, colours[0],
+                    -1, cv2.LINE_AA)
+        cv2.putText(final, str(int(frame_index)), (5,30),
+                    cv2.FONT_HERSHEY_SCRIPT_SIMPLEX, 1, (255,255,255), 2)
+    return final, meas_now
@@ -6,9 +6,25 @@
 Methods to save video data in a parallel process.
 """
 
+import concurrent.futures
 import multiprocessing as mp
+import os
+import tempfile
+import threading
+import time
 
 import cv2
+import numpy as np
+
+from . import memorymanagement as mmg
+
+WRITER_SLOTS = 16 # frames a VideoWriterProcess can hold before it falls behind
+POLL_INTERVAL = 0.001 # seconds
+PRODUCER_CHECK = 0.5 # seconds between checks that a writer's producer is alive
+START_TIMEOUT = 10.0 # seconds to wait for a writer process to open its file
+WRITER_POOL_SIZE = 2 # clips encoded at once by a WriterPool
+SPILL_SUFFIX = ".frames"
+CLIP_BUDGET = 256*2**20 # bytes of frames a ClipRecorder keeps in memory
 
 def vidout(frames, filename, fps, framesize, codec):
     """
@@ -20,6 +36,8 @@ def vidout(frames, filename, fps, framesize, codec):
         fps (float): Frames per second for the output video.
         framesize (tuple): Size of the video frames as (width, height).
 
+    Frames may be colour (BGR) or grayscale, but not both.
+
     Raises:
         AssertionError: If the video writer fails to open the file.
     """
@@ -29,27 +47,480 @@ def vidout(frames, filename, fps, framesize, codec):
                             fourcc = fourcc,
                             fps = fps,
                             frameSize = framesize,
-                            isColor = True
+                            isColor = len(frames) == 0 or frames[0].ndim == 3
                         )
     assert vidout.isOpened()
     for frame in frames:
         vidout.write(frame)
     vidout.release()
 
+def spill_frames(frames, directory=None):
+    """
+    Writes frames, raw and one after the other, to a new spill file.
+
+    Args:
+        frames (iterable of ndarray): uint8 frames, all of one shape.
+        directory (str, optional): where the file is made; defaults to the
+            system's temporary directory.
+
+    Returns:
+        path of the spill file, and the shape of one frame (None if there
+        were no frames).
+    """
+    fd, spillfile = tempfile.mkstemp(suffix=SPILL_SUFFIX, dir=directory)
+    shape = None
+    with os.fdopen(fd, "wb") as f:
+        for frame in frames:
+            shape = frame.shape
+            f.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+    return spillfile, shape
+
+def read_spilled(spillfile, shape):
+    """
+    Returns the frames in a spill file, memory-mapped, as an (n, *shape)
+    array. A frame only partly written is left out.
+    """
+    framebytes = int(np.prod(shape)) if shape is not None else 0
+    count = os.path.getsize(spillfile)//framebytes if framebytes else 0
+    if count == 0:
+        return np.zeros((0, *(shape or ())), dtype=np.uint8)
+    return np.memmap(spillfile, dtype=np.uint8, mode="r",
+                        shape=(count, *shape))
+
+def vidout_from_spill(spillfile, shape, filename, fps, framesize, codec,
+                        remove=True):
+    """
+    Writes the frames in a spill file (see spill_frames) to a video file
+    using `vidout`, and then removes the spill file if remove is True.
+
+    Returns:
+        filename
+    """
+    try:
+        frames = read_spilled(spillfile, shape)
+        vidout(frames, filename, fps, framesize, codec)
+        del frames
+    finally:
+        if remove:
+            os.remove(spillfile)
+    return filename
+
+def _pass_on(source, target):
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+class WriterPool:
+    """
+    Persistent pool of processes that write clips to video files, so that
+    writing many clips (e.g. from chunking cassettes) neither starts a new
+    process each time nor encodes more than max_workers clips at once. Clips
+    are handed over as spill files: frames are written out by a thread of
+    the calling process, and read back by the encoding process through a
+    memory map, so that they are never pickled.
+
+    Submitting returns a concurrent.futures.Future, whose result is the name
+    of the video file: poll it with done(), or wait with result() (or
+    asyncio.wrap_future).
+    """
+
+    def __init__(self, max_workers=WRITER_POOL_SIZE):
+        """
+        Args:
+            max_workers (int): clips encoded at once; further clips wait.
+        """
+        self.max_workers = max_workers
+        self.encoders = None # process pool, started by start()
+        self.spiller = None # thread writing spill files
+        self.jobs = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts the encoding processes, unless already started. It is called
+        on first use, but where processes are forked, call it before the
+        calling process starts any threads: a process forked while another
+        thread holds a lock inherits that lock held, and can deadlock on it.
+        """
+        with self.lock:
+            if self.encoders is None:
+                self.encoders = concurrent.futures.ProcessPoolExecutor(
+                                                        self.max_workers)
+                self.spiller = concurrent.futures.ThreadPoolExecutor(1)
+                # with fork, all encoders are forked on the first submission
+                self.encoders.submit(int)
+
+    def _track(self, job):
+        with self.lock:
+            self.jobs = [j for j in self.jobs if not j.done()]
+            self.jobs.append(job)
+        return job
+
+    def submit_spilled(self, spillfile, shape, filename, fps, framesize,
+                        codec, remove=True):
+        """
+        Queues the frames in a spill file to be written to a video file (see
+        vidout_from_spill for arguments).
+
+        Returns:
+            concurrent.futures.Future
+        """
+        self.start()
+        return self._track(self.encoders.submit(vidout_from_spill,
+                                                spillfile, shape, filename,
+                                                fps, framesize, codec, remove))
+
+    def submit(self, frames, filename, fps, framesize, codec, spill_dir=None):
+        """
+        Queues frames to be written to a video file. frames is spilled to a
+        file in spill_dir (by default, next to filename) in the background;
+        it must not be changed until then.
+
+        Returns:
+            concurrent.futures.Future
+        """
+        self.start()
+        if spill_dir is None:
+            spill_dir = os.path.dirname(os.path.abspath(filename))
+        job = concurrent.futures.Future()
+
+        def spill():
+            try:
+                spillfile, shape = spill_frames(frames, spill_dir)
+                encoding = self.encoders.submit(vidout_from_spill,
+                                                spillfile, shape, filename,
+                                                fps, framesize, codec)
+            except Exception as e:
+                job.set_exception(e)
+                return
+            encoding.add_done_callback(lambda done: _pass_on(done, job))
+
+        self.spiller.submit(spill)
+        return self._track(job)
+
+    def pending(self):
+        """Number of clips not yet written."""
+        with self.lock:
+            return sum(not j.done() for j in self.jobs)
+
+    def wait(self, timeout=None):
+        """
+        Waits until all submitted clips are written, or timeout seconds.
+
+        Returns:
+            True if all were written.
+        """
+        with self.lock:
+            jobs = list(self.jobs)
+        _, not_done = concurrent.futures.wait(jobs, timeout)
+        return len(not_done) == 0
+
+    def close(self):
+        """Waits for all clips to be written, and stops the pool."""
+        self.wait()
+        if self.encoders is not None:
+            self.spiller.shutdown()
+            self.encoders.shutdown()
+            self.encoders = None
+            self.spiller = None
+
+_writer_pool = None
+
+def get_writer_pool():
+    """Returns the WriterPool shared within this process."""
+    global _writer_pool
+    if _writer_pool is None:
+        _writer_pool = WriterPool()
+    return _writer_pool
+
+def close_writer_pool():
+    """Waits for the shared WriterPool, if any, to write all clips."""
+    global _writer_pool
+    if _writer_pool is not None:
+        _writer_pool.close()
+        _writer_pool = None
+
 def prl_vidout(frames, filename, fps, framesize, codec):
     """
-    Launches a parallel process to write video frames to a file using `vidout`.
+    Writes video frames to a file in the background, using the shared
+    WriterPool (see get_writer_pool).
 
     Args:
         frames (list of ndarray): List of frames to be written to the video.
+            It must not be changed afterwards.
         filename (str): Path to the output video file.
         fps (float): Frames per second for the output video.
         framesize (tuple): Size of the video frames as (width, height).
         codec (str): e.g., XVID, DIVX, mp4v, etc.
 
-    Notes:
-        This function uses `multiprocessing` to offload the writing process,
-        which can be useful to avoid blocking the main execution thread.
+    Returns:
+        concurrent.futures.Future, done once the file is written.
     """
-    proc = mp.Process(target=vidout, args=(frames, filename, fps, framesize, codec))
-    proc.start()
+    return get_writer_pool().submit(frames, filename, fps, framesize, codec)
+
+def _write_from_queue(shm, n_slots, shape, filename, fps, framesize, codec,
+                        ready, producer):
+    queue = mmg.FrameQueue(shm, n_slots, shape)
+    fourcc = cv2.VideoWriter_fourcc(*codec)
+    vidout = cv2.VideoWriter(
+                            filename=filename,
+                            fourcc = fourcc,
+                            fps = fps,
+                            frameSize = framesize,
+                            isColor = len(shape) == 3
+                        )
+    if not vidout.isOpened():
+        queue.state = mmg.QUEUE_FAILED
+        return
+    queue.state = mmg.QUEUE_RUNNING
+    while True:
+        # ready is released once per frame put, and once on closing
+        if not ready.acquire(timeout=PRODUCER_CHECK):
+            if os.getppid() != producer:# gone without closing the queue
+                break
+            continue
+        frame = queue.peek()
+        if frame is None:
+            if queue.state == mmg.QUEUE_CLOSED:
+                break
+            continue
+        vidout.write(frame)
+        queue.pop()
+    vidout.release()
+
+class VideoWriterProcess:
+    """
+    Writes frames to a video file in a separate process, so that encoding
+    does not hold up the process producing frames. Frames are handed over
+    through a queue in shared memory (see memorymanagement.FrameQueue), so
+    write() costs one copy of the frame. When the queue is full, frames are
+    either dropped, or write() waits for a free slot.
+
+    Used like cv2.VideoWriter: write() frames, then release().
+    """
+
+    def __init__(self, filename, fps, framesize, codec, shape, drop=False,
+                    slots=WRITER_SLOTS, shm=None):
+        """
+        Args:
+            filename (str): Path to the output video file.
+            fps (float): Frames per second for the output video.
+            framesize (tuple): Size of the video frames as (width, height).
+            codec (str): e.g., XVID, DIVX, mp4v, etc.
+            shape (tuple): shape of frames, (height, width, 3) for colour or
+                (height, width) for grayscale.
+            drop (bool): drop frames when the queue is full, instead of
+                waiting for the writer to catch up.
+            slots (int): number of frames the queue holds.
+            shm (SharedMemory, optional): segment of at least
+                memorymanagement.framequeue_size() bytes to hold the queue,
+                e.g. to let other processes watch it. By default one is
+                created, and unlinked on release().
+        """
+        self.filename = filename
+        self.drop = drop
+        self.owns_shm = shm is None
+        if shm is None:
+            shm = mmg.create_shared_data(mmg.framequeue_size(slots, shape))
+        self.shm = shm
+        self.queue = mmg.FrameQueue(shm, slots, shape)
+        self.queue.reset()
+        self.ready = mp.Semaphore(0) # counts frames put, for the writer to wait on
+        self.proc = mp.Process(target=_write_from_queue,
+                                args=(shm, slots, tuple(shape), filename,
+                                        fps, framesize, codec,
+                                        self.ready, os.getpid()),
+                                daemon=True)
+
+    def start(self):
+        """
+        Starts the writer process.
+
+        Raises:
+            RuntimeError: If the video file could not be opened for writing.
+        """
+        self.proc.start()
+        t_start = time.time()
+        while self.queue.state == mmg.QUEUE_STARTING\
+                and self.proc.is_alive()\
+                and time.time() - t_start < START_TIMEOUT:
+            time.sleep(POLL_INTERVAL)
+        if self.queue.state != mmg.QUEUE_RUNNING:
+            self.release()
+            raise RuntimeError(f"could not open {self.filename} for writing")
+
+    def write(self, frame):
+        """
+        Queues frame to be written.
+
+        Returns:
+            False if frame was dropped, else True.
+
+        Raises:
+            RuntimeError: If the writer process has stopped.
+        """
+        while not self.queue.put(frame):
+            if self.drop:
+                self.queue.drop()
+                return False
+            if not self.proc.is_alive():
+                raise RuntimeError(f"video writer for {self.filename} stopped")
+            time.sleep(POLL_INTERVAL)
+        self.ready.release()
+        return True
+
+    @property
+    def depth(self):
+        """Number of frames waiting to be written."""
+        return self.queue.depth
+
+    @property
+    def dropped(self):
+        """Number of frames dropped so far."""
+        return self.queue.dropped
+
+    @property
+    def written(self):
+        """Number of frames written so far."""
+        return self.queue.taken
+
+    def release(self):
+        """
+        Waits for all queued frames to be written, and closes the file. The
+        counts above stay available only if shm was given.
+        """
+        if self.proc is None:
+            return
+        if self.queue.state == mmg.QUEUE_RUNNING:
+            self.queue.state = mmg.QUEUE_CLOSED
+            self.ready.release()
+        self.proc.join()
+        self.proc = None
+        if self.owns_shm:
+            self.queue = None # its arrays must go before the segment
+            self.shm.close()
+            self.shm.unlink()
+
+class ClipRecorder:
+    """
+    Frames of a clip being recorded, kept in memory until they take more than
+    budget bytes. Beyond that, the frames held so far are written to a spill
+    file (see spill_frames), and every further frame is written straight to
+    it, so that a clip of any length takes at most budget bytes of memory.
+    dump() hands the clip to a WriterPool, which encodes it from the spill
+    file.
+
+    len() gives the number of frames in the clip; frames are also available
+    by index and by iteration, in order, those on disk as read-only views of
+    a memory map.
+    """
+
+    def __init__(self, budget=CLIP_BUDGET, spill_dir=None):
+        """
+        Args:
+            budget (int): bytes of frames kept in memory at most.
+            spill_dir (str, optional): directory of the spill file, made if
+                missing; defaults to the system's temporary directory.
+        """
+        self.budget = budget
+        self.spill_dir = spill_dir
+        self.frames = [] # in memory, while nothing is spilled
+        self.nbytes = 0
+        self.spillfile = None
+        self.spill = None # open spill file
+        self.spilled = 0
+        self.shape = None
+        self.view = None # memory map of the spill file, as last read
+
+    def __len__(self):
+        return self.spilled + len(self.frames)
+
+    def append(self, frame):
+        """Adds a copy of frame to the clip."""
+        self.shape = frame.shape
+        if self.spill is None and self.nbytes + frame.nbytes <= self.budget:
+            self.frames.append(frame.copy())
+            self.nbytes += frame.nbytes
+            return
+        if self.spill is None:
+            self._start_spilling()
+        self.spill.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+        self.spilled += 1
+
+    def extend(self, frames):
+        """Adds copies of frames (Nones are skipped) to the clip."""
+        for frame in frames:
+            if frame is not None:
+                self.append(frame)
+
+    def _start_spilling(self):
+        if self.spill_dir is not None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        fd, self.spillfile = tempfile.mkstemp(suffix=SPILL_SUFFIX,
+                                                dir=self.spill_dir)
+        self.spill = os.fdopen(fd, "wb")
+        for frame in self.frames:
+            self.spill.write(frame.data)
+        self.spilled = len(self.frames)
+        self.frames = []
+        self.nbytes = 0
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("clip index out of range")
+        if self.spill is None:
+            return self.frames[i]
+        if self.view is None or i >= len(self.view):# spilled more since
+            self.spill.flush()
+            self.view = read_spilled(self.spillfile, self.shape)
+        return self.view[i]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def dump(self, filename, fps, framesize, codec, pool=None):
+        """
+        Hands the clip over to be written to a video file, and starts a new,
+        empty clip.
+
+        Args:
+            filename (str): Path to the output video file.
+            fps (float): Frames per second for the output video.
+            framesize (tuple): Size of the video frames as (width, height).
+            codec (str): e.g., XVID, DIVX, mp4v, etc.
+            pool (WriterPool, optional): defaults to get_writer_pool().
+
+        Returns:
+            concurrent.futures.Future, done once the file is written.
+        """
+        if pool is None:
+            pool = get_writer_pool()
+        if self.spill is None:
+            job = pool.submit(self.frames, filename, fps, framesize, codec)
+        else:
+            self.spill.close()
+            job = pool.submit_spilled(self.spillfile, self.shape, filename,
+                                        fps, framesize, codec)
+            self.spill = None
+            self.spillfile = None
+        self._reset()
+        return job
+
+    def clear(self):
+        """Discards the clip."""
+        if self.spill is not None:
+            self.spill.close()
+            os.remove(self.spillfile)
+            self.spill = None
+            self.spillfile = None
+        self._reset()
+
+    def _reset(self):
+        self.view = None
+        self.frames = []
+        self.nbytes = 0
+        self.spilled = 0
@@ -42,12 +42,15 @@ add_rectangular_mask_bottom, add_rectangular_mask_right = 570, 300
 @server
 def add_rectangular_mask(server):
     frame = server.current_frame
-    mask = np.zeros(frame.shape)
-    mask = cv2.rectangle(mask, (add_rectangular_mask_top, add_rectangular_mask_left),
+    if getattr(server, "add_rectangular_mask__mask", None) is None:
+        # built once, as a uint8 image with the frame's channels
+        mask = np.zeros(frame.shape, dtype=np.uint8)
+        cv2.rectangle(mask, (add_rectangular_mask_top, add_rectangular_mask_left),
                         (add_rectangular_mask_bottom, add_rectangular_mask_right),
                         (255,255,255),
                         -1)
-    frame[mask ==  0] = 0
+        server.add_rectangular_mask__mask = mask
+    cv2.bitwise_and(frame, server.add_rectangular_mask__mask, dst=frame)
 # CASETTE ENDS: ADD_RECTANGULAR_MASK
 
 top = 74
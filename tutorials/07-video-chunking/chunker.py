@@ -34,6 +34,7 @@ server, semm = trl.spawn_trserver("./ultralisks.mp4",
                                     params=params,
                                     n_ind=2,
                                     realtime=False,
+                                    writer_pool=True,#cassettes below dump clips
                                     buffer_size=1#just need a second before interactions
                                 )
 
@@ -41,10 +41,13 @@ def add_mask(server):
     frame = server.current_frame
     if frame is None:
         return
-    mask = np.zeros((frame.shape[0], frame.shape[1]))
-    cv2.circle(mask, (mask.shape[1]//2 + add_circular_mask_offset_x, mask.shape[0]//2 +
-    add_circular_mask_offset_y), add_circular_mask_radius, 255, -1)
-    frame[mask == 0] = 0
+    if getattr(server, "add_mask__mask", None) is None:
+        # built once, as a uint8 image with the frame's channels
+        mask = np.zeros(frame.shape, dtype=np.uint8)
+        cv2.circle(mask, (mask.shape[1]//2 + add_circular_mask_offset_x, mask.shape[0]//2 +
+        add_circular_mask_offset_y), add_circular_mask_radius, (255,255,255), -1)
+        server.add_mask__mask = mask
+    cv2.bitwise_and(frame, server.add_mask__mask, dst=frame)
 # CASETTE ENDS: ADD_CIRCULAR_MASK
 
 
@@ -29,6 +29,7 @@ server, semm = trl.spawn_trserver(4,
                                 n_ind = 1,
                                 realtime=True,
                                 buffer_size = 1,
+                                writer_pool=True,#cassettes below dump clips
                                 draw=False,
                                 feed_id="insectinthehouse"
                             )
@@ -42,9 +43,12 @@ def add_mask(server):
     frame = server.current_frame
     if frame is None:
         return
-    mask = np.zeros((frame.shape[0], frame.shape[1]))
-    cv2.circle(mask, (mask.shape[1]//2 + mask_offset_x, mask.shape[0]//2 + mask_offset_y), 110, 255, -1)
-    frame[mask == 0] = 0
+    if getattr(server, "add_mask__mask", None) is None:
+        # built once, as a uint8 image with the frame's channels
+        mask = np.zeros(frame.shape, dtype=np.uint8)
+        cv2.circle(mask, (mask.shape[1]//2 + mask_offset_x, mask.shape[0]//2 + mask_offset_y), 110, (255,255,255), -1)
+        server.add_mask__mask = mask
+    cv2.bitwise_and(frame, server.add_mask__mask, dst=frame)
 
 
 top = 120